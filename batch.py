@@ -0,0 +1,254 @@
+import numpy as np
+
+from map import Map
+import sensors
+import kernel
+
+
+# Batched version of the Snake / Map pair: every environment lives in the same arrays
+# and one update() call advances all the snakes that are still alive
+class SnakeBatch:
+    # Possible states of each bloc (those of Map)
+    EMPTY, WALL, FRUIT, SNAKE = Map.EMPTY, Map.WALL, Map.FRUIT, Map.SNAKE
+
+    # Velocities (y, x) for each direction index, same order as the neural network outputs
+    DIRS = np.array([[-1, 0], [1, 0], [0, -1], [0, 1]])    # up, down, left, right
+
+    # compiled runs update() with the Numba kernel (plain python if Numba is not installed)
+    # rngs holds the random generator of each environment (see seeding.py)
+    def __init__(self, nb_envs, map_w, map_h, size, col_walls, col_fruits, col_head, col_body, hunger_threshold = 200, compiled = False, rngs = None):
+        self.setup(nb_envs, map_w, map_h, size, col_walls, col_fruits, col_head, col_body, hunger_threshold, compiled, rngs)
+        self.reset(np.arange(nb_envs), self.rngs)
+
+
+    # Starts a new game in the environments envs (new map and snake), drawing from the generators rngs
+    def reset(self, envs, rngs):
+        envs = np.asarray(envs, dtype=int)
+        size = self.SIZE
+        for i, rng in zip(envs, rngs):
+            self.rngs[i] = rng
+
+        self.grid[envs] = self.WALL
+        self.grid[envs, 1:-1, 1:-1] = self.EMPTY
+        self.head[envs] = size - 1
+        self.size[envs] = size
+        self.alive[envs] = True
+        self.steps[envs] = 0
+        self.steps_without_eating[envs] = 0
+        self.hungry[envs] = False
+
+        # Random draws of each environment are done in the same order as creating
+        # a Map then its Snake, so both engines give the same games for the same generators
+        # (the first fruit is picked among the empty blocs of a new map, i.e. its inside, in row-major order)
+        first_fruits = np.zeros(len(envs), dtype=int)
+        heads = np.zeros((len(envs), 2), dtype=int)
+        for k, rng in enumerate(rngs):
+            first_fruits[k] = rng.integers((self.MAP_W - 2) * (self.MAP_H - 2))
+            heads[k, 0] = rng.integers(size, self.MAP_H - size)
+            heads[k, 1] = rng.integers(size, self.MAP_W - size)
+
+        self.fruit_pos_y[envs] = 1 + first_fruits // (self.MAP_W - 2)
+        self.fruit_pos_x[envs] = 1 + first_fruits % (self.MAP_W - 2)
+        self.grid[envs, self.fruit_pos_y[envs], self.fruit_pos_x[envs]] = self.FRUIT
+        self.fruit_on_map[envs] = True
+
+        # Choose starting direction (-> towards farthest wall)
+        dists = np.stack([heads[:, 0], self.MAP_H - heads[:, 0], heads[:, 1], self.MAP_W - heads[:, 1]], axis=1)
+        vel = self.DIRS[np.argmax(dists, axis=1)]
+        self.y_vel[envs], self.x_vel[envs] = vel[:, 0], vel[:, 1]
+        self.changed_dir[envs] = True       # Snake.__init__ uses up its direction change for the first frame
+
+        # Put body parts following direction (tail first in the buffer, head last)
+        for k in range(size):
+            self.body_y[envs, size - 1 - k] = heads[:, 0] - k * vel[:, 0]
+            self.body_x[envs, size - 1 - k] = heads[:, 1] - k * vel[:, 1]
+            self.grid[envs, self.body_y[envs, size - 1 - k], self.body_x[envs, size - 1 - k]] = self.SNAKE
+
+
+    # Allocates the arrays holding all the environments (empty maps surrounded by walls)
+    def setup(self, nb_envs, map_w, map_h, size, col_walls, col_fruits, col_head, col_body, hunger_threshold, compiled, rngs):
+        self.NB_ENVS = nb_envs
+        self.MAP_W, self.MAP_H = map_w, map_h
+        self.COL_WALLS, self.COL_FRUITS = col_walls, col_fruits
+        self.COL_HEAD, self.COL_BODY = col_head, col_body
+        self.HUNGER_TH = hunger_threshold
+        self.SIZE = size                    # Initial size of the snakes
+        self.compiled = compiled
+        self.rngs = list(rngs) if rngs is not None else [np.random.default_rng() for _ in range(nb_envs)]
+
+        # A snake can never be longer than its map, so the ring buffers never overflow
+        self.CAPACITY = map_w * map_h
+
+        # Maps creation (walls on the edges, rest is empty), one (H, W) grid per environment
+        self.grid = np.full((nb_envs, map_h, map_w), self.WALL, dtype=np.int8)
+        self.grid[:, 1:-1, 1:-1] = self.EMPTY
+
+        # Snake bodies as ring buffers: segment k of snake i is at index (head[i] - k) % CAPACITY
+        # (int16 coordinates, maps are never wider than 32767 blocs)
+        self.body_y = np.zeros((nb_envs, self.CAPACITY), dtype=np.int16)
+        self.body_x = np.zeros((nb_envs, self.CAPACITY), dtype=np.int16)
+        self.head = np.full(nb_envs, size - 1)
+        self.size = np.full(nb_envs, size)
+
+        self.x_vel = np.zeros(nb_envs, dtype=np.int8)
+        self.y_vel = np.zeros(nb_envs, dtype=np.int8)
+        self.changed_dir = np.zeros(nb_envs, dtype=bool)
+
+        self.fruit_pos_x = np.zeros(nb_envs, dtype=int)
+        self.fruit_pos_y = np.zeros(nb_envs, dtype=int)
+        self.fruit_on_map = np.zeros(nb_envs, dtype=bool)
+
+        self.alive = np.ones(nb_envs, dtype=bool)
+        self.steps = np.zeros(nb_envs, dtype=int)
+        self.steps_without_eating = np.zeros(nb_envs, dtype=int)
+        self.hungry = np.zeros(nb_envs, dtype=bool)
+
+
+    # Builds a batch from the current state of Snake objects (each on its own Map, all maps of the same size)
+    @classmethod
+    def from_snakes(cls, snakes, compiled = False):
+        batch = cls.__new__(cls)
+
+        first = snakes[0]
+        batch.setup(
+            len(snakes), first.map.MAP_W, first.map.MAP_H, first.size,
+            first.map.COL_WALLS, first.map.COL_FRUITS, first.COL_HEAD, first.COL_BODY,
+            first.HUNGER_TH, compiled, [snake.map.rng for snake in snakes],
+        )
+
+        for i, snake in enumerate(snakes):
+            batch.grid[i] = snake.map.map
+            batch.body_y[i] = snake.body[:, 0]
+            batch.body_x[i] = snake.body[:, 1]
+            batch.head[i] = snake.head
+            batch.size[i] = snake.size
+
+            batch.x_vel[i], batch.y_vel[i] = snake.x_vel, snake.y_vel
+            batch.changed_dir[i] = snake.changed_dir
+
+            batch.fruit_pos_x[i], batch.fruit_pos_y[i] = snake.map.fruit_pos_x, snake.map.fruit_pos_y
+            batch.fruit_on_map[i] = snake.map.fruit_on_map
+
+            batch.alive[i] = snake.alive
+            batch.steps[i] = snake.steps
+            batch.steps_without_eating[i] = snake.steps_without_eating
+            batch.hungry[i] = snake.hungry
+
+        return batch
+
+
+    # Positions of the heads (y, x) of the given snakes
+    def heads(self, idx):
+        return self.body_y[idx, self.head[idx]], self.body_x[idx, self.head[idx]]
+
+
+    # Positions of the tails (y, x) of the given snakes
+    def tails(self, idx, k=1):
+        pos = (self.head[idx] - self.size[idx] + k) % self.CAPACITY
+        return self.body_y[idx, pos], self.body_x[idx, pos]
+
+
+    # Changes velocities of the snakes, dirs holds a direction index per environment (-1 keeps the current one)
+    def change_dir(self, dirs):
+        call = (dirs >= 0) & ~self.changed_dir
+
+        up = call & (dirs == 0) & (self.y_vel != 1)
+        down = call & (dirs == 1) & (self.y_vel != -1)
+        left = call & (dirs == 2) & (self.x_vel != 1)
+        right = call & (dirs == 3) & (self.x_vel != -1)
+
+        turn = up | down | left | right
+        self.y_vel[turn] = self.DIRS[dirs[turn], 0]
+        self.x_vel[turn] = self.DIRS[dirs[turn], 1]
+
+        self.changed_dir |= call
+
+
+    # Updates every living snake (movement, growing...) then every map (fruit spawning)
+    # If hunger_penalty is given, hungry snakes are killed in the same step and lose that many steps
+    def update(self, hunger_penalty = None):
+        live = np.flatnonzero(self.alive)
+
+        if self.compiled:
+            kernel.compiled(kernel.step)(
+                self.grid, self.body_y, self.body_x, self.head, self.size, self.y_vel, self.x_vel, self.changed_dir,
+                self.fruit_on_map, self.alive, self.steps, self.steps_without_eating, self.hungry,
+                self.HUNGER_TH, -1 if hunger_penalty is None else hunger_penalty,
+            )
+            self.spawn_fruits(live[~self.fruit_on_map[live]])
+            return
+        self.changed_dir[live] = False
+
+        head_y, head_x = self.heads(live)
+        next_y = (head_y + self.y_vel[live]) % self.MAP_H
+        next_x = (head_x + self.x_vel[live]) % self.MAP_W
+        target = self.grid[live, next_y, next_x]
+
+        # Die if hits wall or self
+        dead = (target == self.WALL) | (target == self.SNAKE)
+        self.alive[live[dead]] = False
+
+        moving = live[~dead]
+        next_y, next_x = next_y[~dead], next_x[~dead]
+        eats = target[~dead] == self.FRUIT
+
+        # Free the tail cell, unless the snake grows (then the tail stays where it is)
+        not_growing = moving[~eats]
+        tail_y, tail_x = self.tails(not_growing)
+        self.grid[not_growing, tail_y, tail_x] = self.EMPTY
+
+        # Push the new head
+        self.head[moving] = (self.head[moving] + 1) % self.CAPACITY
+        self.body_y[moving, self.head[moving]] = next_y
+        self.body_x[moving, self.head[moving]] = next_x
+        self.grid[moving, next_y, next_x] = self.SNAKE
+
+        eaters = moving[eats]
+        self.size[eaters] += 1
+        self.fruit_on_map[eaters] = False
+
+        # Increase steps taken
+        self.steps[moving] += 1
+        self.steps_without_eating[moving] += 1
+        self.steps_without_eating[eaters] = 0
+
+        self.hungry[live] = self.steps_without_eating[live] > self.HUNGER_TH
+
+        # Kill hungry snakes
+        if hunger_penalty is not None:
+            hungry = live[self.hungry[live]]
+            self.alive[hungry] = False
+            self.steps[hungry] -= hunger_penalty
+
+        # Update each map (spawn a fruit where there is none, like Map.update)
+        self.spawn_fruits(live[~self.fruit_on_map[live]])
+
+
+    # Spawns a new fruit on the given maps (same draws and order as Map.spawn_fruit)
+    # A full map gets no fruit (fruit_on_map stays False)
+    def spawn_fruits(self, envs):
+        for i in envs:
+            free = np.flatnonzero(self.grid[i] == self.EMPTY)
+            if len(free) == 0:
+                continue
+
+            self.fruit_pos_y[i], self.fruit_pos_x[i] = divmod(free[self.rngs[i].integers(len(free))], self.MAP_W)
+
+            self.grid[i, self.fruit_pos_y[i], self.fruit_pos_x[i]] = self.FRUIT
+            self.fruit_on_map[i] = True
+
+
+    # Builds the inputs of the neural networks of the given snakes, as a (len(idx), n * n + 10) array
+    def observe(self, idx, n=5):
+        head_y, head_x = self.heads(idx)
+        tail_y, tail_x = self.tails(idx, k=1)
+        prev_y, prev_x = self.tails(idx, k=2)
+
+        return sensors.observe(
+            self.grid, idx, head_y, head_x,
+            self.fruit_pos_y[idx], self.fruit_pos_x[idx],
+            self.x_vel[idx], self.y_vel[idx],
+            prev_y - tail_y, prev_x - tail_x,
+            n=n,
+        )
+
@@ -0,0 +1,133 @@
+import numpy as np
+
+from neat.graphs import feed_forward_layers
+
+
+# Vectorized versions of neat's activation functions (same clamping as neat.activations)
+ACTIVATIONS = {
+    'sigmoid': lambda z: 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0))),
+    'tanh': lambda z: np.tanh(np.clip(2.5 * z, -60.0, 60.0)),
+    'sin': lambda z: np.sin(np.clip(5.0 * z, -60.0, 60.0)),
+    'gauss': lambda z: np.exp(-5.0 * np.clip(z, -3.4, 3.4) ** 2),
+    'relu': lambda z: np.maximum(z, 0.0),
+    'softplus': lambda z: 0.2 * np.log1p(np.exp(np.clip(5.0 * z, -60.0, 60.0))),
+    'identity': lambda z: z,
+    'clamped': lambda z: np.clip(z, -1.0, 1.0),
+    'abs': np.abs,
+    'square': np.square,
+    'cube': lambda z: z ** 3,
+}
+
+
+# Nodes and links of all networks that are evaluated at the same depth
+class Layer:
+    def __init__(self, link_net, link_src, link_dst, link_weight, node_net, node_slot, node_bias, node_response, node_act):
+        self.link_net, self.link_src, self.link_dst, self.link_weight = link_net, link_src, link_dst, link_weight
+        self.node_net, self.node_slot, self.node_bias, self.node_response = node_net, node_slot, node_bias, node_response
+
+        # Nodes grouped by activation function, to call each function once per layer
+        self.node_acts = [(ACTIVATIONS[name], np.flatnonzero(node_act == name)) for name in np.unique(node_act)]
+
+
+# Many feed-forward networks evaluated together, layer by layer, with numpy arrays
+# Every network writes its node values in its own row of a (nb_nets, nb_slots) matrix:
+# inputs first, then outputs, then hidden nodes (networks with fewer nodes leave the extra slots unused)
+class BatchNetwork:
+    def __init__(self, nb_inputs, nb_outputs, nb_slots, layers, nb_nets):
+        self.NB_INPUTS, self.NB_OUTPUTS = nb_inputs, nb_outputs
+        self.NB_SLOTS = nb_slots
+        self.layers = layers
+        self.nb_nets = nb_nets
+
+
+    # Returns the outputs of the networks idx (all by default) for one row of inputs per network, as a (len(idx), nb_outputs) array
+    def activate(self, inputs, idx=None):
+        if idx is None:
+            idx = np.arange(self.nb_nets)
+
+        inputs = np.asarray(inputs, dtype=float)
+        if inputs.shape != (len(idx), self.NB_INPUTS):
+            raise RuntimeError("Expected inputs of shape {}, got {}".format((len(idx), self.NB_INPUTS), inputs.shape))
+
+        values = np.zeros((len(idx), self.NB_SLOTS))
+        values[:, :self.NB_INPUTS] = inputs
+
+        # Row of each network in the values matrix (-1 if not evaluated)
+        rows = np.full(self.nb_nets, -1)
+        rows[idx] = np.arange(len(idx))
+
+        for layer in self.layers:
+            # Weighted sum of the incoming links of every node of the layer
+            link_row = rows[layer.link_net]
+            used = link_row >= 0
+            link_row = link_row[used]
+
+            contribs = values[link_row, layer.link_src[used]] * layer.link_weight[used]
+            sums = np.bincount(link_row * self.NB_SLOTS + layer.link_dst[used], weights=contribs, minlength=values.size)
+
+            # Activation of every node of the layer
+            node_row = rows[layer.node_net]
+            for act, nodes in layer.node_acts:
+                nodes = nodes[node_row[nodes] >= 0]
+                row, slot = node_row[nodes], layer.node_slot[nodes]
+
+                values[row, slot] = act(layer.node_bias[nodes] + layer.node_response[nodes] * sums[row * self.NB_SLOTS + slot])
+
+        return values[:, self.NB_INPUTS:self.NB_INPUTS + self.NB_OUTPUTS]
+
+
+    # Receives a list of genomes and returns their phenotypes (same networks as neat.nn.FeedForwardNetwork.create)
+    @staticmethod
+    def create(genomes, config):
+        input_keys = config.genome_config.input_keys
+        output_keys = config.genome_config.output_keys
+
+        links_by_depth = []
+        nodes_by_depth = []
+        nb_slots = len(input_keys) + len(output_keys)
+
+        for net, genome in enumerate(genomes):
+            # Gather expressed connections
+            connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+            layers = feed_forward_layers(input_keys, output_keys, connections)
+
+            # Slot of each node in the values matrix
+            slots = {key: i for i, key in enumerate(input_keys + output_keys)}
+            for layer in layers:
+                for node in layer:
+                    if node not in slots:
+                        slots[node] = len(slots)
+            nb_slots = max(nb_slots, len(slots))
+
+            incoming = {}
+            for inode, onode in connections:
+                incoming.setdefault(onode, []).append((inode, genome.connections[inode, onode].weight))
+
+            for depth, layer in enumerate(layers):
+                if depth == len(links_by_depth):
+                    links_by_depth.append([])
+                    nodes_by_depth.append([])
+
+                for node in layer:
+                    ng = genome.nodes[node]
+                    if ng.aggregation != 'sum':
+                        raise ValueError("Only the 'sum' aggregation is supported, got '{}'".format(ng.aggregation))
+                    if ng.activation not in ACTIVATIONS:
+                        raise ValueError("Unsupported activation function '{}'".format(ng.activation))
+
+                    nodes_by_depth[depth].append((net, slots[node], ng.bias, ng.response, ng.activation))
+                    for inode, weight in incoming.get(node, []):
+                        links_by_depth[depth].append((net, slots[inode], slots[node], weight))
+
+        layers = []
+        for links, nodes in zip(links_by_depth, nodes_by_depth):
+            link_net, link_src, link_dst, link_weight = zip(*links) if links else ((), (), (), ())
+            node_net, node_slot, node_bias, node_response, node_act = zip(*nodes)
+
+            layers.append(Layer(
+                np.array(link_net, dtype=int), np.array(link_src, dtype=int), np.array(link_dst, dtype=int), np.array(link_weight, dtype=float),
+                np.array(node_net, dtype=int), np.array(node_slot, dtype=int), np.array(node_bias, dtype=float), np.array(node_response, dtype=float),
+                np.array(node_act),
+            ))
+
+        return BatchNetwork(len(input_keys), len(output_keys), nb_slots, layers, len(genomes))
@@ -0,0 +1,376 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import tracemalloc
+import argparse
+import platform
+import subprocess
+import contextlib
+
+import neat
+import numpy as np
+
+from game import Game
+from map import Map
+from snake import Snake
+from batch import SnakeBatch
+from batch_net import BatchNetwork
+import sensors
+import kernel
+
+
+# Fixed-seed performance workloads, results are written to a JSON file
+# and can be compared with the results of another version (--compare)
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(LOCAL_DIR, 'config-feedforward.txt')
+
+DIRECTIONS = ['up', 'down', 'left', 'right']
+
+
+def load_config(pop_size):
+    config = neat.config.Config(
+        neat.DefaultGenome,
+        neat.DefaultReproduction,
+        neat.DefaultSpeciesSet,
+        neat.DefaultStagnation,
+        CONFIG_PATH
+    )
+    config.pop_size = pop_size
+
+    return config
+
+
+# Snake.move, Snake.check_neighbours, sensors.observe_snakes and Map.update (with a fruit to respawn),
+# timed call by call on snakes taking random turns until nb_calls moves were made
+def bench_snake_ops(map_size, nb_calls, seed):
+    rng = np.random.default_rng(seed)
+
+    ops = ['move', 'check_neighbours', 'observe', 'map_update']
+    elapsed = dict.fromkeys(ops, 0)
+    calls = 0
+
+    while calls < nb_calls:
+        map = Map(map_size, map_size, 0, 0, [255, 255, 255], [255, 0, 255], rng=rng)
+        snake = Snake(map, 2, [255, 0, 0], [0, 255, 255], hunger_threshold=map_size ** 3)
+
+        while snake.alive and calls < nb_calls:
+            snake.changed_dir = False
+            snake.change_dir(DIRECTIONS[rng.integers(4)])
+
+            t = time.perf_counter()
+            snake.check_neighbours(n=5)
+            elapsed['check_neighbours'] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            sensors.observe_snakes([snake], n=5)
+            elapsed['observe'] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            snake.move()
+            elapsed['move'] += time.perf_counter() - t
+
+            # Remove the fruit so that every update spawns one
+            if map.fruit_on_map:
+                map.map[map.fruit_pos_y][map.fruit_pos_x] = map.EMPTY
+                map.fruit_on_map = False
+
+            t = time.perf_counter()
+            map.update()
+            elapsed['map_update'] += time.perf_counter() - t
+
+            calls += 1
+
+    results = {}
+    for op in ops:
+        results['{}/grid={}'.format(op, map_size)] = {
+            'calls': calls,
+            'usec_per_call': 1e6 * elapsed[op] / calls,
+            'calls_per_sec': calls / elapsed[op],
+        }
+
+    return results
+
+
+# Snake.move and Snake.check_neighbours on snakes of fixed lengths, whose cost per step should not depend on the length
+# Each snake goes straight towards the farthest wall of a large map without fruits (so it never grows nor dies),
+# a new one is made once it gets close to the wall
+def bench_snake_lengths(lengths, nb_calls, seed, map_size=256):
+    rng = np.random.default_rng(seed)
+
+    results = {}
+    for length in lengths:
+        elapsed = {'move': 0, 'check_neighbours': 0}
+        calls = 0
+
+        while calls < nb_calls:
+            map = Map(map_size, map_size, 0, 0, [255, 255, 255], [255, 0, 255], rng=rng)
+            snake = Snake(map, length, [255, 0, 0], [0, 255, 255], hunger_threshold=map_size ** 3)
+            map.map[map.fruit_pos_y][map.fruit_pos_x] = map.EMPTY
+            map.fruit_on_map = False
+
+            for _ in range(min(max(snake.distances_to_walls()) - 3, nb_calls - calls)):
+                t = time.perf_counter()
+                snake.check_neighbours(n=5)
+                elapsed['check_neighbours'] += time.perf_counter() - t
+
+                t = time.perf_counter()
+                snake.move()
+                elapsed['move'] += time.perf_counter() - t
+
+                calls += 1
+
+        for op in elapsed:
+            results['{}/length={}'.format(op, length)] = {
+                'calls': calls,
+                'usec_per_call': 1e6 * elapsed[op] / calls,
+                'calls_per_sec': calls / elapsed[op],
+            }
+
+    return results
+
+
+# Network activation for a whole (fresh) population, one FeedForwardNetwork per genome vs one BatchNetwork
+def bench_activation(pop_size, nb_rounds, seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+    config = load_config(pop_size)
+    genomes = list(neat.Population(config).population.values())
+    inputs = np.random.uniform(-1, 1, size=(pop_size, len(config.genome_config.input_keys)))
+
+    nets = [neat.nn.FeedForwardNetwork.create(genome, config) for genome in genomes]
+    t = time.perf_counter()
+    for _ in range(nb_rounds):
+        for net, row in zip(nets, inputs):
+            net.activate(row)
+    elapsed_single = time.perf_counter() - t
+
+    batch_net = BatchNetwork.create(genomes, config)
+    t = time.perf_counter()
+    for _ in range(nb_rounds):
+        batch_net.activate(inputs)
+    elapsed_batch = time.perf_counter() - t
+
+    activations = nb_rounds * pop_size
+    return {
+        'activate/feed_forward/pop={}'.format(pop_size): {'activations_per_sec': activations / elapsed_single},
+        'activate/batch/pop={}'.format(pop_size): {'activations_per_sec': activations / elapsed_batch},
+    }
+
+
+# Full training generations (neat reproduction included) of a headless Game
+# engine is 'object' (Snake / Map), 'batched' (SnakeBatch) or 'compiled' (SnakeBatch + Numba kernel)
+def bench_generations(engine, pop_size, map_size, nb_generations, seed):
+    random.seed(seed)
+
+    config = load_config(pop_size)
+    nb_maps_w = 10
+    nb_maps_h = int(np.ceil(pop_size / nb_maps_w))
+
+    game = Game(600, 600, pop_size, nb_maps_w, nb_maps_h, map_size, map_size, 0, headless=True, batched=engine != 'object', compiled=engine == 'compiled', seed=seed)
+    game.gen = 0
+    game.general_max_size = 0
+    game.timer.enabled = True
+
+    # Time spent in run_neat (the rest of a generation is neat's own work)
+    sim_time = [0]
+
+    def eval_genomes(genomes, config):
+        t = time.perf_counter()
+        game.run_neat(genomes, config)
+        sim_time[0] += time.perf_counter() - t
+
+    pop = neat.Population(config)
+
+    t = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        pop.run(eval_genomes, nb_generations)
+    total_time = time.perf_counter() - t
+
+    # Phases of the simulation loop, what is left of run_neat is setup (maps, snakes, networks creation)
+    phases = dict(game.timer.totals)
+    phases['setup'] = sim_time[0] - sum(phases.values())
+    phases['neat'] = total_time - sim_time[0]
+
+    return {
+        'generations/{}/pop={}/grid={}'.format(engine, pop_size, map_size): {
+            'generations': nb_generations,
+            'env_steps': game.env_steps,
+            'env_steps_per_sec': game.env_steps / sim_time[0],
+            'generations_per_min': 60 * nb_generations / total_time,
+            'phases_sec': phases,
+        }
+    }
+
+
+# Memory held by nb_envs environments (random generators included), as Map / Snake objects and as a SnakeBatch
+def bench_memory(map_size, nb_envs, seed):
+    results = {}
+
+    for engine in ['object', 'batched']:
+        tracemalloc.start()
+
+        rngs = [np.random.default_rng([seed, i]) for i in range(nb_envs)]
+        if engine == 'object':
+            envs = []
+            for rng in rngs:
+                map = Map(map_size, map_size, 0, 0, [255, 255, 255], [255, 0, 255], rng=rng)
+                envs.append(Snake(map, 2, [255, 0, 0], [0, 255, 255], hunger_threshold=50))
+        else:
+            envs = SnakeBatch(nb_envs, map_size, map_size, 2, [255, 255, 255], [255, 0, 255], [255, 0, 0], [0, 255, 255], hunger_threshold=50, rngs=rngs)
+
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del envs, rngs
+
+        results['memory/{}/grid={}'.format(engine, map_size)] = {
+            'envs': nb_envs,
+            'bytes_per_env': allocated / nb_envs,
+            'mb_per_1k_envs': allocated / nb_envs * 1000 / 1e6,
+        }
+
+    return results
+
+
+# Cold start of the modules a headless process imports (evaluation for pool workers, game for headless training,
+# score for scoring), in a fresh interpreter: best import time of nb_runs and whether pygame / numba got loaded
+def bench_startup(nb_runs):
+    code = (
+        'import sys, time, json; t = time.perf_counter(); import {}; '
+        'print(json.dumps([1000 * (time.perf_counter() - t), "pygame" in sys.modules, "numba" in sys.modules]))'
+    )
+
+    results = {}
+    for module in ['evaluation', 'game', 'score']:
+        runs = []
+        for _ in range(nb_runs):
+            output = subprocess.check_output([sys.executable, '-c', code.format(module)], cwd=LOCAL_DIR)
+            runs.append(json.loads(output.decode().strip().splitlines()[-1]))
+
+        results['startup/{}'.format(module)] = {
+            'import_ms': min(ms for ms, _, _ in runs),
+            'loads_pygame': runs[0][1],
+            'loads_numba': runs[0][2],
+        }
+
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=LOCAL_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(pop_sizes, map_sizes, lengths, engines, nb_generations, nb_calls, seed):
+    results = {}
+
+    print('Cold start of headless processes')
+    results.update(bench_startup(5))
+
+    for map_size in map_sizes:
+        print('Snake / Map operations, grid {}'.format(map_size))
+        results.update(bench_snake_ops(map_size, nb_calls, seed))
+
+    print('Snake operations, lengths {}'.format(', '.join(str(length) for length in lengths)))
+    results.update(bench_snake_lengths(lengths, nb_calls, seed))
+
+    for map_size in map_sizes:
+        print('Memory per environment, grid {}'.format(map_size))
+        results.update(bench_memory(map_size, 1000, seed))
+
+    for pop_size in pop_sizes:
+        print('Network activation, population {}'.format(pop_size))
+        results.update(bench_activation(pop_size, max(1, nb_calls // pop_size), seed))
+
+    # Compile the kernel before timing (compilation is cached on disk anyway)
+    if 'compiled' in engines:
+        batch = SnakeBatch(1, 12, 12, 2, [255, 255, 255], [255, 0, 255], [255, 0, 0], [0, 255, 255], compiled=True)
+        batch.update()
+
+    for engine in engines:
+        for pop_size in pop_sizes:
+            for map_size in map_sizes:
+                print('Generations, {} engine, population {}, grid {}'.format(engine, pop_size, map_size))
+                results.update(bench_generations(engine, pop_size, map_size, nb_generations, seed))
+
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'numba': kernel.NUMBA_AVAILABLE,
+            'machine': platform.machine(),
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+# Prints the improvement ratio of every metric found in both reports (new / old for speeds, old / new for memory
+# and startup time), returns the regressed ones
+def compare(old, new, tolerance=0.1):
+    regressions = []
+
+    for name, metrics in new['results'].items():
+        if name not in old['results']:
+            continue
+
+        for metric, value in metrics.items():
+            if metric.endswith('_per_sec') or metric.endswith('_per_min'):
+                ratio = value / old['results'][name][metric]
+            elif metric in ['bytes_per_env', 'import_ms']:
+                ratio = old['results'][name][metric] / value
+            else:
+                continue
+            flag = ''
+            if ratio < 1 - tolerance:
+                flag = '  <-- regression'
+                regressions.append((name, metric, ratio))
+
+            print('{:<45} {:<22} {:>6.2f}x{}'.format(name, metric, ratio, flag))
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fixed-seed performance benchmarks')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file the results are written to')
+    parser.add_argument('--compare', help='JSON results of another version to compare with (exit code 1 on regression)')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='slowdown allowed before reporting a regression')
+    parser.add_argument('--pop-sizes', type=int, nargs='+', default=[50, 150, 500])
+    parser.add_argument('--grid-sizes', type=int, nargs='+', default=[12, 24])
+    parser.add_argument('--lengths', type=int, nargs='+', default=[2, 10, 50, 100], help='snake lengths of the per-length Snake workload')
+    parser.add_argument('--engines', nargs='+', default=['object', 'batched', 'compiled'], choices=['object', 'batched', 'compiled'])
+    parser.add_argument('--generations', type=int, default=5, help='generations per training workload')
+    parser.add_argument('--calls', type=int, default=20000, help='calls per Snake / Map operation workload')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quick', action='store_true', help='small workloads (smoke test)')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.pop_sizes, args.grid_sizes, args.generations, args.calls = [50], [12], 2, 2000
+
+    engines = args.engines
+    if 'compiled' in engines and not kernel.NUMBA_AVAILABLE:
+        print('Numba is not installed, skipping the compiled engine')
+        engines = [engine for engine in engines if engine != 'compiled']
+
+    report = run(args.pop_sizes, args.grid_sizes, args.lengths, engines, args.generations, args.calls, args.seed)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Results written to {}'.format(args.output))
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+
+        if compare(old, report, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,97 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Canonical hash of what makes a genome play: node parameters and enabled connections, in key order
+# (two genomes with different keys but the same structure and weights get the same hash)
+def genome_hash(genome):
+    connections = np.array([(i, o, cg.weight) for (i, o), cg in genome.connections.items() if cg.enabled], dtype=float).reshape(-1, 3)
+    connections = connections[np.lexsort((connections[:, 1], connections[:, 0]))]
+
+    nodes = np.array([(key, node.bias, node.response) for key, node in genome.nodes.items()], dtype=float).reshape(-1, 3)
+    nodes = nodes[np.argsort(nodes[:, 0])]
+    functions = ' '.join(genome.nodes[int(key)].activation + ' ' + genome.nodes[int(key)].aggregation for key in nodes[:, 0])
+
+    h = hashlib.blake2b(connections.tobytes(), digest_size=16)
+    h.update(nodes.tobytes())
+    h.update(functions.encode())
+
+    return h.digest()
+
+
+# Fitness of each episode played by each genome structure, so that unchanged genomes (elites...) are not simulated again
+# Entries are kept in least recently used order, the oldest ones are dropped beyond max_entries
+# A genome is evaluated on max_episodes episodes (the number of episodes per generation by default): the ones in
+# the cache are reused and only the missing ones are played, so with more than the episodes per generation, long
+# lived genomes add new episodes to their fitness each generation until they have max_episodes
+# The fitnesses only make sense for one evaluation setup (map size, hunger...): use one cache per run
+class FitnessCache:
+    def __init__(self, max_entries=10000, max_episodes=None):
+        self.max_entries = max_entries
+        self.max_episodes = max_episodes
+        self.entries = OrderedDict()
+
+        # Hash of each genome key (neat never changes a genome once created, elites are the same objects)
+        self.hashes = OrderedDict()
+
+        # Lookups of genomes that had (hits) or did not have (misses) episodes in the cache, and episodes reused
+        self.hits = 0
+        self.misses = 0
+        self.episodes_reused = 0
+
+
+    # Hash of the genome, computed once per genome key
+    def key(self, genome):
+        if genome.key in self.hashes:
+            self.hashes.move_to_end(genome.key)
+        else:
+            self.hashes[genome.key] = genome_hash(genome)
+            if len(self.hashes) > self.max_entries:
+                self.hashes.popitem(last=False)
+
+        return self.hashes[genome.key]
+
+
+    # Fitnesses of the episodes played by the genome (or an identical one)
+    def scores(self, genome):
+        key = self.key(genome)
+        if key not in self.entries:
+            self.misses += 1
+            return []
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        self.episodes_reused += len(self.entries[key])
+
+        return list(self.entries[key].values())
+
+
+    # Number of episodes to play this generation for a genome that has nb_cached episodes in the cache
+    def needed(self, nb_cached, episodes):
+        max_episodes = self.max_episodes if self.max_episodes is not None else episodes
+        return max(0, min(episodes, max_episodes - nb_cached))
+
+
+    # Records the fitness of the episode seeded by seed (the oldest episodes are dropped beyond max_episodes)
+    def add(self, genome, seed, fitness):
+        key = self.key(genome)
+        if key not in self.entries:
+            self.entries[key] = OrderedDict()
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        self.entries.move_to_end(key)
+
+        scores = self.entries[key]
+        scores[tuple(seed)] = fitness
+        if self.max_episodes is not None and len(scores) > self.max_episodes:
+            scores.popitem(last=False)
+
+
+    # Counters since the last call, as a short text for the generation reports
+    def report(self):
+        text = 'cache: {} hits, {} misses, {} episodes reused'.format(self.hits, self.misses, self.episodes_reused)
+        self.hits, self.misses, self.episodes_reused = 0, 0, 0
+
+        return text
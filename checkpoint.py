@@ -0,0 +1,143 @@
+import os
+import glob
+import gzip
+import pickle
+import random
+import threading
+import time
+from itertools import count
+
+import neat
+import numpy as np
+
+
+# Reporter saving the whole training state of pop every generation_interval generations or time_interval seconds
+# (whichever comes first): population, species, reproduction (genome keys, ancestors), random generators
+# and the seed and counters of the evaluator (gen, general_max_size)
+# The state is pickled at the end of a generation, compressing and writing it is done by a background thread
+# Files are written to a temporary name then renamed, so a crash while writing never leaves a broken checkpoint
+class Checkpointer(neat.reporting.BaseReporter):
+    def __init__(self, pop, counters, directory, generation_interval=None, time_interval=300, keep=3):
+        self.pop = pop
+        self.counters = counters
+        self.directory = directory
+        self.generation_interval = generation_interval
+        self.time_interval = time_interval
+        self.keep = keep
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.generation = None
+        self.last_generation = None
+        self.last_time = time.time()
+        self.writer = None
+
+
+    def start_generation(self, generation):
+        self.generation = generation
+        if self.last_generation is None:
+            self.last_generation = generation
+
+
+    def end_generation(self, config, population, species_set):
+        due = self.time_interval is not None and time.time() - self.last_time >= self.time_interval
+        due = due or (self.generation_interval is not None and self.generation + 1 - self.last_generation >= self.generation_interval)
+
+        if due:
+            # The population and species already hold the next generation
+            self.save(self.generation + 1)
+
+
+    # Saves the state of pop as generation; wait makes the write synchronous
+    def save(self, generation, wait=False):
+        pop = self.pop
+
+        # Next genome key (the counter itself is consumed to read it)
+        next_key = next(pop.reproduction.genome_indexer)
+        pop.reproduction.genome_indexer = count(next_key)
+
+        # Reporters (files, threads...) are not part of the state
+        species_set = pop.species
+        reporters, species_set.reporters = species_set.reporters, None
+        try:
+            data = pickle.dumps({
+                'generation': generation,
+                'config': pop.config,
+                'population': pop.population,
+                'species_set': species_set,
+                'next_genome_key': next_key,
+                'ancestors': pop.reproduction.ancestors,
+                'random_state': random.getstate(),
+                'np_random_state': np.random.get_state(),
+                'seed': self.counters.seed,
+                'gen': self.counters.gen,
+                'general_max_size': self.counters.general_max_size,
+            }, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            species_set.reporters = reporters
+
+        path = os.path.join(self.directory, 'neat-checkpoint-{}.pkl.gz'.format(generation))
+
+        # One write at a time (a write takes much less than a checkpoint interval)
+        self.join()
+        self.writer = threading.Thread(target=self.write, args=(data, path))
+        self.writer.start()
+        if wait:
+            self.join()
+
+        self.last_generation = generation
+        self.last_time = time.time()
+
+
+    # Saves the population being evaluated (e.g. on Ctrl-C), this generation is evaluated again on resume
+    def save_now(self):
+        self.save(self.pop.generation, wait=True)
+
+
+    def write(self, data, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=5))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        print('Checkpoint saved to {}'.format(path))
+
+        # Remove the oldest checkpoints
+        for old_path in checkpoints(self.directory)[:-self.keep]:
+            os.remove(old_path)
+
+
+    def join(self):
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+
+
+# Checkpoint files of a directory, oldest first
+def checkpoints(directory):
+    paths = glob.glob(os.path.join(directory, 'neat-checkpoint-*.pkl.gz'))
+    return sorted(paths, key=lambda path: int(os.path.basename(path).split('-')[-1].split('.')[0]))
+
+
+# Rebuilds the population saved in a checkpoint (and restores the random generators)
+# counters (Game or ParallelEvaluator) get back their seed, gen and general_max_size
+def restore(path, counters=None):
+    with gzip.open(path) as f:
+        state = pickle.load(f)
+
+    random.setstate(state['random_state'])
+    np.random.set_state(state['np_random_state'])
+
+    pop = neat.Population(state['config'], (state['population'], state['species_set'], state['generation']))
+    pop.species.reporters = pop.reporters
+    pop.reproduction.genome_indexer = count(state['next_genome_key'])
+    pop.reproduction.ancestors = state['ancestors']
+
+    if counters is not None:
+        counters.seed = state['seed']
+        counters.gen = state['gen']
+        counters.general_max_size = state['general_max_size']
+
+    return pop
@@ -0,0 +1,275 @@
+import multiprocessing
+import functools
+import time
+from collections import deque
+
+import neat
+import numpy as np
+
+from map import Map
+from snake import Snake
+import seeding
+
+
+# Plays one game with the genome's neural network on its own map and returns (fitness, stats)
+# Nothing is shared between calls, so it can run in any process
+# seed is the entropy of the game's random generator (seeding.env_seed), giving the same game as Game.run_neat
+# max_steps ends the game after that many steps (see Game)
+def eval_genome(genome, config, seed=None, map_w=12, map_h=12, hunger_threshold=50, max_steps=None):
+    net = neat.nn.FeedForwardNetwork.create(genome, config)
+
+    map = Map(map_w, map_h, 0, 0, [255, 255, 255], [255, 0, 255], rng=np.random.default_rng(seed))
+    snake = Snake(map, 2, [255, 0, 0], [0, 255, 255], hunger_threshold=hunger_threshold)
+
+    # Same step as in Game.run_neat: observe and act, update snake then map, kill if hungry
+    # Env steps taken to eat each fruit (since the start or the previous fruit) are recorded
+    env_steps = 0
+    size = snake.size
+    fruit_steps = []
+    last_fruit = 0
+    while snake.alive:
+        env_steps += 1
+
+        output = net.activate(snake.observe(n=5))
+        snake.act(output, th=0.5)
+
+        snake.update()
+        map.update()
+
+        if snake.size != size:
+            size = snake.size
+            fruit_steps.append(env_steps - last_fruit)
+            last_fruit = env_steps
+
+        if snake.hungry:
+            snake.alive = False
+            snake.death = 'hunger'
+            snake.steps -= 50
+
+        elif snake.alive and env_steps == max_steps:
+            snake.alive = False
+            snake.death = 'limit'
+
+    fitness = ((snake.size - 2) ** 3) / snake.steps
+
+    stats = {
+        'size': snake.size,
+        'steps': snake.steps,
+        'env_steps': env_steps,
+        'hungry': snake.hungry,
+        'death': snake.death,
+        'fruit_steps': fruit_steps,
+    }
+
+    return fitness, stats
+
+
+# Aggregations of the fitnesses of the episodes of a genome
+AGGREGATES = {
+    'mean': np.mean,
+    'min': np.min,
+    'median': np.median,
+}
+
+
+# Highest fitness of one episode: a snake needs at least one step per fruit, so (size - 2) ** 3 / steps < (size - 2) ** 2
+def max_episode_fitness(map_w, map_h):
+    return float(((map_w - 2) * (map_h - 2) - 2) ** 2)
+
+
+# Best aggregated fitness a genome can still reach, given the fitnesses of the episodes it played (out of episodes)
+def upper_bound(scores, episodes, aggregate, max_fitness):
+    return AGGREGATES[aggregate](list(scores) + [max_fitness] * (episodes - len(scores)))
+
+
+# Fitness to beat for each genome to become an elite: best fitness of its species in the previous generation
+# (elites are carried over with their fitness, new genomes have none), or of the whole population without species_set
+# Must be called before fitnesses are reset
+def elite_thresholds(genomes, species_set=None):
+    best = max([genome.fitness for _, genome in genomes if genome.fitness is not None], default=None)
+    if species_set is None:
+        return [best for _ in genomes]
+
+    thresholds = []
+    for key, _ in genomes:
+        members = species_set.get_species(key).members.values()
+        thresholds.append(max([member.fitness for member in members if member.fitness is not None], default=None))
+
+    return thresholds
+
+
+# Order in which Game plays the episodes of a generation, one job being one episode of one genome
+# Jobs are handed out one at a time to whichever slot is free, each genome playing its episodes one after the other
+# (episode e + 1 is queued once episode e is over, so early stopping and fitnesses do not depend on the order)
+# needed, scores and thresholds are per genome: episodes to play, fitnesses of the cached episodes, elite to beat
+class Schedule:
+    def __init__(self, needed, scores, thresholds, aggregate='mean', max_fitness=np.inf, step_budget=None):
+        self.needed = needed
+        self.scores = scores
+        self.thresholds = thresholds
+        self.aggregate = aggregate
+        self.max_fitness = max_fitness
+        self.step_budget = step_budget
+
+        self.played = [0] * len(needed)
+        self.queue = deque(i for i in range(len(needed)) if needed[i] > 0)
+
+
+    # Next job as (genome index, episode), None when there is nothing left to play
+    # Once env_steps reach the step budget, only genomes that have not played yet start an episode
+    def next(self, env_steps=0):
+        while self.queue:
+            i = self.queue.popleft()
+            if self.step_budget is None or env_steps < self.step_budget or self.played[i] == 0:
+                return i, self.played[i]
+
+        return None
+
+
+    # Records the fitness of the episode genome i just played, returns its aggregated fitness
+    # The genome plays its next episode unless it can no longer beat its elite
+    def finish(self, i, fitness):
+        self.scores[i].append(fitness)
+        self.played[i] += 1
+
+        # Episodes the genome plays in all (cached ones included)
+        total = len(self.scores[i]) + self.needed[i] - self.played[i]
+        if self.played[i] < self.needed[i]:
+            if self.thresholds[i] is None or upper_bound(self.scores[i], total, self.aggregate, self.max_fitness) > self.thresholds[i]:
+                self.queue.append(i)
+
+        return float(AGGREGATES[self.aggregate](self.scores[i]))
+
+
+# Plays up to len(seeds) episodes (one per seed) with eval_function and aggregates their fitnesses with the ones
+# of the episodes already played (cached_scores), stats['scores'] holds the fitness of each new episode
+# Stops early once the genome can no longer beat threshold, i.e. do better (its fitness is then the aggregate of the episodes played)
+def eval_genome_episodes(eval_function, genome, config, seeds, aggregate='mean', threshold=None, max_fitness=np.inf, cached_scores=()):
+    scores = list(cached_scores)
+    stats = {'size': 0, 'env_steps': 0, 'episodes': 0, 'scores': []}
+
+    for seed in seeds:
+        fitness, episode_stats = eval_function(genome, config, seed)
+        scores.append(fitness)
+
+        stats['size'] = max(stats['size'], episode_stats['size'])
+        stats['env_steps'] += episode_stats['env_steps']
+        stats['episodes'] += 1
+        stats['scores'].append(fitness)
+
+        if threshold is not None and upper_bound(scores, len(cached_scores) + len(seeds), aggregate, max_fitness) <= threshold:
+            break
+
+    return float(AGGREGATES[aggregate](scores)), stats
+
+
+# Evaluates a population over a pool of processes (same interface as neat.ParallelEvaluator)
+# Each genome plays episodes games, aggregated with aggregate (see AGGREGATES)
+# early_stop drops the remaining games of a genome that can no longer beat its species' elite
+# Games are played on maps of map_w x map_h blocs (the board of Game), max_steps ends them after that many steps
+# (both passed to eval_function, like hunger_threshold)
+class ParallelEvaluator:
+    def __init__(self, num_workers, eval_function=eval_genome, timeout=None, seed=None, episodes=1, aggregate='mean', early_stop=False, max_steps=None,
+            map_w=12, map_h=12, hunger_threshold=50):
+        self.num_workers = num_workers
+        self.map_w, self.map_h = map_w, map_h
+        self.eval_function = functools.partial(eval_function, map_w=map_w, map_h=map_h, hunger_threshold=hunger_threshold, max_steps=max_steps)
+        self.timeout = timeout
+
+        self.episodes = episodes
+        self.aggregate = aggregate
+        self.early_stop = early_stop
+        self.species_set = None         # Species of the population (set by the caller), for early_stop
+        self.cache = None               # Fitness cache (cache.FitnessCache, set by the caller)
+
+        # Same counters and seed as Game
+        self.gen = 0
+        self.max_size = 0
+        self.general_max_size = 0
+        self.seed = seeding.run_seed(seed)
+
+        self.start()
+
+
+    def __del__(self):
+        self.close()
+
+
+    # Starts the processes playing the games
+    def start(self):
+        self.pool = multiprocessing.Pool(self.num_workers)
+
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+    # Plays the jobs (genome, seeds, elite threshold, cached scores), returns the result of
+    # eval_genome_episodes for each job, in order
+    # Genomes are sent one per task: a worker that is done picks the next pending genome, so a long game
+    # only holds up its own worker (the overhead is negligible next to playing the games)
+    def play(self, jobs, config, max_fitness):
+        jobs = [
+            (self.eval_function, genome, config, seeds, self.aggregate, threshold, max_fitness, scores)
+            for genome, seeds, threshold, scores in jobs
+        ]
+        return self.pool.starmap_async(eval_genome_episodes, jobs, 1).get(timeout=self.timeout)
+
+
+    # Fitness function to pass to neat.Population.run
+    def evaluate(self, genomes, config):
+        start_time = time.time()
+
+        thresholds = [None] * len(genomes)
+        if self.early_stop:
+            thresholds = elite_thresholds(genomes, self.species_set)
+        max_fitness = max_episode_fitness(self.map_w, self.map_h)
+
+        # Episodes already played by each genome (fitness cache), only the missing ones are played
+        cached_scores = [[] for _ in genomes]
+        needed = [self.episodes] * len(genomes)
+        if self.cache is not None:
+            for i, (_, genome) in enumerate(genomes):
+                cached_scores[i] = self.cache.scores(genome)
+                needed[i] = self.cache.needed(len(cached_scores[i]), self.episodes)
+
+        # Each game is seeded from (run seed, generation, genome key, episode), as in Game.run_neat
+        seeds = [[seeding.env_seed(self.seed, self.gen, key, episode) for episode in range(n)] for (key, _), n in zip(genomes, needed)]
+        jobs = [
+            (genome, genome_seeds, threshold, scores)
+            for (_, genome), genome_seeds, threshold, scores in zip(genomes, seeds, thresholds, cached_scores)
+            if len(genome_seeds) > 0
+        ]
+        results = iter(self.play(jobs, config, max_fitness))
+
+        env_steps = 0
+        max_size = 0
+        self.episodes_played = 0
+        for (_, genome), genome_seeds, scores in zip(genomes, seeds, cached_scores):
+            if len(genome_seeds) == 0:
+                genome.fitness = float(AGGREGATES[self.aggregate](scores))
+                continue
+
+            fitness, stats = next(results)
+            genome.fitness = fitness
+
+            if self.cache is not None:
+                for seed, score in zip(genome_seeds, stats['scores']):
+                    self.cache.add(genome, seed, score)
+
+            env_steps += stats['env_steps']
+            max_size = max(max_size, stats['size'])
+            self.episodes_played += stats['episodes']
+
+        self.max_size = max_size
+        self.general_max_size = max(self.general_max_size, max_size)
+
+        # Report simulation speed for this generation
+        elapsed = time.time() - start_time
+        self.steps_per_sec = env_steps / elapsed if elapsed > 0 else 0
+        print('Gen {}: {} env steps in {:.2f}s ({:.0f} steps/sec), {} episodes, max size: {} (all: {}){}'.format(
+            self.gen, env_steps, elapsed, self.steps_per_sec, self.episodes_played, max_size, self.general_max_size,
+            ', ' + self.cache.report() if self.cache is not None else ''))
+
+        self.gen += 1
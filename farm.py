@@ -0,0 +1,274 @@
+import os
+import sys
+import time
+import socket
+import secrets
+import argparse
+import ipaddress
+import threading
+import multiprocessing
+from collections import deque
+from multiprocessing import connection
+
+from evaluation import ParallelEvaluator, eval_genome_episodes
+
+
+# Evaluation farm: a coordinator (main.py --farm) hands the genomes of each generation out to worker processes
+# connected over TCP sockets, on this machine or on other hosts (python farm.py HOST:PORT on each of them)
+#
+# Messages are pickled tuples sent with multiprocessing.connection, the connection is authenticated with a shared
+# key: a peer knowing the key can run code on the other side by sending it a crafted pickle
+# The fixed DEFAULT_AUTHKEY (public, it is right here) is only used on loopback addresses, a coordinator listening
+# on another address without a key makes up a random one and prints it, a worker reaching one needs the key
+#   coordinator -> worker   ('setup', config, eval_function, aggregate, max_fitness)   before the first batch and when it changes
+#                           ('jobs', (round, batch), [(genome, seeds, threshold, cached scores), ...])
+#                           ('stop',)
+#   worker -> coordinator   ('results', (round, batch), [(fitness, stats), ...])
+#
+# Every game is seeded by the coordinator (seeding.env_seed), so results do not depend on the worker that played it
+
+DEFAULT_ADDRESS = 'localhost:6010'
+DEFAULT_AUTHKEY = 'snake-neat'
+
+
+# (host, port) of 'host:port'
+def parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+# Whether host only reaches this machine (the default key is only safe there)
+def is_loopback(host):
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+# A connected worker, playing at most one batch at a time
+class Worker:
+    def __init__(self, conn, name):
+        self.conn = conn
+        self.name = name
+        self.setup = None       # Last setup sent
+        self.batch = None       # Batch being played, as (round, index in the round)
+        self.deadline = None    # Time after which the batch is handed to another worker
+
+
+# Evaluates a population on the workers of a farm (same interface and results as ParallelEvaluator)
+# Genomes are sent in batches of batch_size to amortize round-trips, each worker playing one batch at a time
+# A batch not done after timeout seconds is re-dispatched to the next free worker, the first results in win
+# (a slow worker keeps its connection and gets new batches once it answers, a lost one is dropped)
+# local_workers worker processes are started on this machine, other workers can join (and leave) at any time
+# Without authkey, the default key is used on a loopback address and a random one (printed) on any other
+class FarmEvaluator(ParallelEvaluator):
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None, local_workers=0, batch_size=8, timeout=60, **kwargs):
+        self.address = parse_address(address) if isinstance(address, str) else address
+
+        if authkey is None and is_loopback(self.address[0]):
+            authkey = DEFAULT_AUTHKEY
+        elif authkey is None:
+            authkey = secrets.token_hex(16)
+            print('Farm key: {} (start the workers with --authkey or SNAKE_FARM_KEY set to it)'.format(authkey))
+        self.authkey = authkey.encode() if isinstance(authkey, str) else authkey
+        self.batch_size = batch_size
+
+        super().__init__(local_workers, timeout=timeout, **kwargs)
+
+
+    # Listens for workers (accepted by a background thread) and starts the local ones
+    def start(self):
+        self.listener = connection.Listener(self.address, authkey=self.authkey)
+        self.address = self.listener.address
+        print('Farm listening on {}:{}'.format(*self.address))
+
+        self.workers = []
+        self.joined = deque()
+        self.round = 0
+        threading.Thread(target=self.accept, daemon=True).start()
+
+        self.processes = [multiprocessing.Process(target=work, args=(self.address, self.authkey, 10), daemon=True) for _ in range(self.num_workers)]
+        for process in self.processes:
+            process.start()
+
+
+    def accept(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except (multiprocessing.AuthenticationError, ConnectionError, EOFError):
+                continue
+            except OSError:
+                return
+
+            self.joined.append(Worker(conn, '{}:{}'.format(*self.listener.last_accepted)))
+
+
+    def close(self):
+        self.workers.extend(self.joined)
+        for worker in self.workers:
+            try:
+                worker.conn.send(('stop',))
+            except OSError:
+                pass
+            worker.conn.close()
+        self.workers = []
+
+        self.listener.close()
+        for process in self.processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+
+
+    # Workers that joined since the last call
+    def add_workers(self):
+        while self.joined:
+            worker = self.joined.popleft()
+            self.workers.append(worker)
+            print('Worker {} joined ({} workers)'.format(worker.name, len(self.workers)))
+
+
+    # Drops a lost worker, its batch goes back to the front of pending
+    def drop(self, worker, pending):
+        self.workers.remove(worker)
+        worker.conn.close()
+        if worker.batch is not None and worker.batch[0] == self.round:
+            pending.appendleft(worker.batch[1])
+        print('Worker {} left ({} workers)'.format(worker.name, len(self.workers)))
+
+
+    # Batches are tagged with the round (call) they belong to: a slow worker may answer a batch of the previous round
+    def play(self, jobs, config, max_fitness):
+        self.round += 1
+        setup = ('setup', config, self.eval_function, self.aggregate, max_fitness)
+        batches = [range(i, min(i + self.batch_size, len(jobs))) for i in range(0, len(jobs), self.batch_size)]
+
+        results = [None] * len(jobs)
+        done = [False] * len(batches)
+        pending = deque(range(len(batches)))
+        waiting = False
+
+        while not all(done):
+            self.add_workers()
+
+            # Hand the pending batches (skipping the ones a slow worker finished meanwhile) out to the free workers
+            for worker in list(self.workers):
+                while pending and done[pending[0]]:
+                    pending.popleft()
+                if not pending:
+                    break
+                if worker.batch is not None:
+                    continue
+
+                batch = pending.popleft()
+                try:
+                    if worker.setup != setup:
+                        worker.conn.send(setup)
+                        worker.setup = setup
+                    worker.conn.send(('jobs', (self.round, batch), [jobs[j] for j in batches[batch]]))
+                except OSError:
+                    pending.appendleft(batch)
+                    self.drop(worker, pending)
+                    continue
+
+                worker.batch = (self.round, batch)
+                worker.deadline = time.time() + self.timeout if self.timeout is not None else None
+
+            busy = [worker for worker in self.workers if worker.batch is not None]
+            if not busy and not waiting:
+                print('Waiting for workers on {}:{}'.format(*self.address))
+            waiting = not busy
+
+            # Results of the workers done (checking for new workers and timeouts at least every 0.1 s)
+            ready = connection.wait([worker.conn for worker in busy], timeout=0.1)
+            for worker in busy:
+                if worker.conn not in ready:
+                    continue
+
+                try:
+                    _, (batch_round, batch), batch_results = worker.conn.recv()
+                except (EOFError, OSError):
+                    self.drop(worker, pending)
+                    continue
+
+                if batch_round == self.round and not done[batch]:
+                    for j, result in zip(batches[batch], batch_results):
+                        results[j] = result
+                    done[batch] = True
+                worker.batch = None
+
+            # Batches taking too long are also given to the next free worker
+            now = time.time()
+            for worker in busy:
+                if worker.batch is None or worker.deadline is None or now <= worker.deadline:
+                    continue
+
+                worker.deadline = None
+                batch_round, batch = worker.batch
+                if batch_round == self.round and not done[batch]:
+                    print('Worker {} timed out on batch {}, re-dispatching it'.format(worker.name, batch))
+                    pending.append(batch)
+
+        return results
+
+
+# Connects to the coordinator at address, trying again for retry seconds while it is not listening
+def connect(address, authkey, retry=0):
+    deadline = time.time() + retry
+    while True:
+        try:
+            return connection.Client(address, authkey=authkey)
+        except ConnectionRefusedError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+# Worker loop: plays the batches sent by the coordinator at address until it stops (or goes away)
+def work(address, authkey, retry=0):
+    conn = connect(address, authkey, retry)
+    setup = None
+
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+
+            if message[0] == 'setup':
+                setup = message[1:]
+
+            elif message[0] == 'jobs':
+                config, eval_function, aggregate, max_fitness = setup
+                results = [
+                    eval_genome_episodes(eval_function, genome, config, seeds, aggregate, threshold, max_fitness, scores)
+                    for genome, seeds, threshold, scores in message[2]
+                ]
+                conn.send(('results', message[1], results))
+
+            elif message[0] == 'stop':
+                return
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Farm worker: plays the games of the coordinator started with main.py --farm')
+    parser.add_argument('address', nargs='?', default=DEFAULT_ADDRESS, help='host:port the coordinator listens on')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='worker processes started on this machine')
+    parser.add_argument('--authkey', default=os.environ.get('SNAKE_FARM_KEY'), help='key shared with the coordinator (SNAKE_FARM_KEY by default, required unless it is on this machine)')
+    parser.add_argument('--retry', type=float, default=60, help='seconds to keep trying to reach the coordinator')
+    args = parser.parse_args()
+
+    address = parse_address(args.address)
+    authkey = args.authkey
+    if authkey is None:
+        if not is_loopback(address[0]):
+            sys.exit('A key is required to reach a coordinator on another machine (--authkey or SNAKE_FARM_KEY, printed by the coordinator)')
+        authkey = DEFAULT_AUTHKEY
+
+    processes = [multiprocessing.Process(target=work, args=(address, authkey.encode(), args.retry)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
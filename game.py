@@ -1,21 +1,64 @@
-import pygame
-
 import neat
 
 import numpy as np
 import time
-from numba import jit, cuda
 
 from map import Map
 from snake import Snake
+from batch import SnakeBatch
+from batch_net import BatchNetwork
+from viewer import Publisher, FRAMES_NAME
+from profiling import PhaseTimer
+from evaluation import AGGREGATES, Schedule, max_episode_fitness, elite_thresholds
+import seeding
+import sensors
+
+
+# Colors of walls, fruits, snake heads and bodies (shared by every map and snake)
+COL_WALLS = [255, 255, 255]
+COL_FRUITS = [255, 0, 255]
+COL_HEAD = [255, 0, 0]
+COL_BODY = [0, 255, 255]
 
 
 # Controls main game
 class Game:
     
-    def __init__(self, win_w, win_h, nb_snakes, nb_maps_w, nb_maps_h, nb_blocs_w, nb_blocs_h, update_time):
-        # Initiate pygame
-        pygame.init()
+    def __init__(self, win_w, win_h, nb_snakes, nb_maps_w, nb_maps_h, nb_blocs_w, nb_blocs_h, update_time, headless=False, batched=False, compiled=False, publish=False, seed=None,
+            episodes=1, aggregate='mean', early_stop=False, step_budget=None, max_steps=None):
+        # Headless mode never opens a window (training on render-less servers)
+        self.headless = headless
+
+        # Publish mode shares the latest frame with viewer processes (see viewer.py), at most 30 times per second
+        # publish is the name of the shared memory block (True for the default one)
+        self.publisher = None
+        if publish:
+            self.publisher = Publisher(nb_maps_w, nb_maps_h, nb_blocs_w, nb_blocs_h, name=FRAMES_NAME if publish is True else publish)
+
+        # Batched mode simulates all snakes at once in a SnakeBatch instead of Snake / Map objects
+        # (stepped by the compiled kernel if compiled is set)
+        self.batched = batched
+        self.compiled = compiled
+
+        # Seed of the run: the environment of each genome draws from a generator derived from (seed, generation, genome key)
+        self.seed = seeding.run_seed(seed)
+
+        # Games played by each genome per generation and aggregation of their fitnesses (see evaluation.AGGREGATES)
+        # early_stop drops the remaining games of a genome that can no longer beat its species' elite (species_set is set by the caller)
+        # step_budget stops starting new games once that many env steps were simulated in the generation
+        # max_steps ends a game after that many steps (a snake that never starves would hold its slot forever)
+        self.episodes = episodes
+        self.aggregate = aggregate
+        self.early_stop = early_stop
+        self.step_budget = step_budget
+        self.max_steps = max_steps
+        self.species_set = None
+
+        # Fitness cache (cache.FitnessCache) reusing the episodes already played by unchanged genomes, set by the caller
+        self.cache = None
+
+        # Recorder saving the games that beat general_max_size (recording.TraceRecorder), set by the caller
+        self.recorder = None
 
         # Setup for rendering
         while win_w % (nb_blocs_w * nb_maps_w) != 0:
@@ -23,7 +66,15 @@ class Game:
         while win_h % (nb_blocs_h * nb_maps_h) != 0:
             win_h -=1
 
-        self.win = pygame.display.set_mode((win_w, win_h))
+        if self.headless:
+            self.win = None
+        else:
+            # Initiate pygame (only imported when rendering, headless workers never load it)
+            import pygame
+            from render import Renderer
+
+            pygame.init()
+            self.win = pygame.display.set_mode((win_w, win_h))
 
         self.NB_SNAKES = nb_snakes
         self.NB_MAPS_W, self.NB_MAPS_H = nb_maps_w, nb_maps_h
@@ -32,9 +83,16 @@ class Game:
         self.bloc_size_x = (win_w / nb_maps_w) / nb_blocs_w
         self.bloc_size_y = (win_h / nb_maps_h) / nb_blocs_h
 
+        if not self.headless:
+            self.renderer = Renderer(
+                self.win, nb_maps_w, nb_maps_h, nb_blocs_w, nb_blocs_h, self.bloc_size_x, self.bloc_size_y,
+                COL_WALLS, COL_FRUITS, COL_HEAD, COL_BODY,
+            )
+
         # Setup maps and snakes
         self.maps = []
         self.snakes = []
+        self.batch = None
 
         # Setup game variables
         self.running = False
@@ -42,10 +100,22 @@ class Game:
         self.UPDATE_TIME = update_time
         self.last_update = time.time()
 
+        # Time spent in each phase of the training loops (sense, activate, update, bookkeeping, draw)
+        # and env steps simulated, both summed over all generations (the timer is off unless profiling)
+        self.timer = PhaseTimer(enabled=False)
+        self.env_steps = 0
+
+        # Number of snakes alive at each step of the last generation (survival curve), games played in it and their lengths
+        self.alive_counts = []
+        self.episodes_played = 0
+        self.episode_lengths = []
+
     
     # Launches the classic game
     
     def run(self):
+        import pygame
+
         self.clock = pygame.time.Clock()
 
         self.maps = []
@@ -58,9 +128,9 @@ class Game:
             for j in range(self.NB_MAPS_W):
                 if k == self.NB_SNAKES:
                     break
-                map = Map(self.NB_BLOCS_W, self.NB_BLOCS_H, j, i, [255, 255, 255], [255, 0, 255])
+                map = Map(self.NB_BLOCS_W, self.NB_BLOCS_H, j, i, COL_WALLS, COL_FRUITS)
                 self.maps.append(map)
-                self.snakes.append(Snake(map, 2, [255, 0, 0], [0, 255, 255]))
+                self.snakes.append(Snake(map, 2, COL_HEAD, COL_BODY))
                 k += 1
 
         # Main game loop
@@ -91,42 +161,45 @@ class Game:
             map.update()
 
 
-    # Draw all what is to be drawn on screen
-    # @jit(target_backend ="cuda")
-    def draw(self, generation=None, max_size = None, general_max_size = None):
-        fill_color = [0, 0, 0]
-        self.win.fill(fill_color)
+    # Maps (walls + fruits) and snakes to show, as (map index, grid, head y, head x)
+    # map k being at position (k % NB_MAPS_W, k // NB_MAPS_W)
+    def frames(self):
+        frames = []
+        for map, snake in zip(self.maps, self.snakes):
+            head_y, head_x = snake.body[snake.head]
+            frames.append((map.POS_Y * self.NB_MAPS_W + map.POS_X, map.map, head_y, head_x))
 
-        # Draw maps (walls + fruits)
-        for map in self.maps:
-            map.draw(self.win, self.bloc_size_x, self.bloc_size_y)
+        if self.batch is not None:
+            live = np.flatnonzero(self.batch.alive)
+            head_y, head_x = self.batch.heads(live)
+            frames += zip(live, self.batch.grid[live], head_y, head_x)
 
-        # Draw snakes
-        for snake in self.snakes:
-            snake.draw(self.win, self.bloc_size_x, self.bloc_size_y, debug=False)
+        return frames
 
-        # Draw info texts if specified
+
+    # Draw all what is to be drawn on screen (only what changed since the last frame is repainted)
+    def draw(self, generation=None, max_size = None, general_max_size = None):
+        frames = self.frames()
+
+        # Info texts if specified
+        texts = []
         if generation is not None:
-            STAT_FONT = pygame.font.SysFont('comicsans', 15)
-            text = STAT_FONT.render('Gen: ' + str(generation), 1, (255, 255, 255))
-            self.win.blit(text, (12, 10))
+            texts.append(('Gen: ' + str(generation), 15, (12, 10)))
 
         if max_size is not None:
-            STAT_FONT = pygame.font.SysFont('comicsans', 12)
-            text = STAT_FONT.render('Max size: ' + str(max_size), 1, (255, 255, 255))
-            self.win.blit(text, (132, 10))
+            texts.append(('Max size: ' + str(max_size), 12, (132, 10)))
         
         if general_max_size is not None:
-            STAT_FONT = pygame.font.SysFont('comicsans', 12)
-            text = STAT_FONT.render('Max size (all): ' + str(general_max_size), 1, (255, 255, 255))
-            self.win.blit(text, (132, 25))
+            texts.append(('Max size (all): ' + str(general_max_size), 12, (132, 25)))
 
-        pygame.display.update()
+        self.renderer.draw(frames, texts)
 
     
     # Handles main game events (quit, pause, reset)
     
     def handle_events(self, handle_movement=True):
+        import pygame
+
         for event in pygame.event.get():
             # Quit program if quit event occurs
             if event.type == pygame.QUIT:
@@ -150,7 +223,7 @@ class Game:
                     all_snakes_dead = True
                     for i in range(len(self.snakes)):
                         if not self.snakes[i].alive:
-                            self.snakes[i] = Snake(self.snakes[i].map, 2, [255, 0, 0], [0, 255, 255], hunger_threshold=100)
+                            self.snakes[i] = Snake(self.snakes[i].map, 2, COL_HEAD, COL_BODY, hunger_threshold=100)
                         else:
                             all_snakes_dead = False
                     if all_snakes_dead:
@@ -179,119 +252,337 @@ class Game:
 
     
     # Trains neat algorithm (alternative to classic run)
-    
+    # Each genome plays self.episodes games (seeded by episode number) and gets the aggregate of their fitnesses
     def run_neat(self, genomes, config):
-        self.clock = pygame.time.Clock()
+        if not self.headless:
+            import pygame
 
-        max_size = 0
+            self.clock = pygame.time.Clock()
 
-        # Keep track of genomes and corresponding neural networks
-        sizes = []
-        self.maps = []
-        self.snakes = []
-        ge = []
-        nets = []
+        self.max_size = 0
 
-        k = 0
-        for i in range(self.NB_MAPS_H):
-            if k == len(genomes):
-                break
-            for j in range(self.NB_MAPS_W):
-                if k == len(genomes):
-                    break
-                map = Map(self.NB_BLOCS_W, self.NB_BLOCS_H, j, i, [255, 255, 255], [255, 0, 255])
-                self.maps.append(map)
-                self.snakes.append(Snake(map, 2, [255, 0, 0], [0, 255, 255], hunger_threshold=50))
-                sizes.append(2)
-                k += 1
+        # Fitness each genome has to beat to be an elite (read before fitnesses are reset)
+        thresholds = [None] * len(genomes)
+        if self.early_stop:
+            thresholds = elite_thresholds(genomes, self.species_set)
+        max_fitness = max_episode_fitness(self.NB_BLOCS_W, self.NB_BLOCS_H)
 
+        # Keep track of genomes and corresponding neural networks (network i of the batch in batched mode)
+        ge = []
         for _, genome in genomes:
             ge.append(genome)
             genome.fitness = 0
 
-            net = neat.nn.FeedForwardNetwork.create(genome, config)
-            nets.append(net)
+        if self.batched:
+            nets = BatchNetwork.create(ge, config)
+        else:
+            nets = [neat.nn.FeedForwardNetwork.create(genome, config) for genome in ge]
+
+        # Fitness of each episode played by each genome (those in the cache first) and episodes left to play
+        scores = [[] for _ in ge]
+        needed = [self.episodes] * len(ge)
+        if self.cache is not None:
+            for i, genome in enumerate(ge):
+                scores[i] = self.cache.scores(genome)
+                needed[i] = self.cache.needed(len(scores[i]), self.episodes)
+
+                if len(scores[i]) > 0:
+                    genome.fitness = float(AGGREGATES[self.aggregate](scores[i]))
+
+        # Games are handed out one at a time to the slots of the simulation (see Schedule): a slot whose game is over
+        # starts the next pending game right away, instead of every slot waiting for the longest game of a round
+        schedule = Schedule(needed, scores, thresholds, self.aggregate, max_fitness, self.step_budget)
+
+        # Only games beating every snake seen so far are recorded
+        if self.recorder is not None:
+            self.recorder.best_size = max(self.recorder.best_size, self.general_max_size)
+
+        start_time = time.time()
+        self.episodes_played = 0
+        self.episode_lengths = []
+        if self.batched:
+            self.play_episodes_batch(genomes, nets, schedule)
+        else:
+            self.play_episodes(genomes, nets, schedule)
+
+        # Survival curve: number of games still running at each of their steps
+        lengths = np.array(self.episode_lengths, dtype=int)
+        env_steps = int(np.sum(lengths))
+        self.alive_counts = (len(lengths) - np.cumsum(np.bincount(lengths)))[:-1].tolist()
+
+        # Report simulation speed for this generation
+        elapsed = time.time() - start_time
+        self.steps_per_sec = env_steps / elapsed if elapsed > 0 else 0
+        self.env_steps += env_steps
+        print('Gen {}: {} env steps in {:.2f}s ({:.0f} steps/sec), {} episodes{}'.format(
+            self.gen, env_steps, elapsed, self.steps_per_sec, self.episodes_played, ', ' + self.cache.report() if self.cache is not None else ''))
 
-        # Main game loop
-        self.running = True
-        while self.running:
-            self.clock.tick(30)
+        self.gen += 1
 
-            if time.time() - self.last_update > self.UPDATE_TIME:
-                self.handle_events(handle_movement=False)       # Do not handle movement since AI takes care of that
+
+    # Records the fitness of a finished game (episode of genome i) and the number of steps it lasted
+    def finish_episode(self, genomes, schedule, i, episode, fitness, steps):
+        genome = genomes[i][1]
+        genome.fitness = schedule.finish(i, fitness)
+
+        if self.cache is not None:
+            self.cache.add(genome, seeding.env_seed(self.seed, self.gen, genomes[i][0], episode), fitness)
+
+        self.episodes_played += 1
+        self.episode_lengths.append(steps)
+
+
+    # Plays the games of schedule on Snake / Map objects, in up to NB_SNAKES slots (slot k is shown as map k)
+    def play_episodes(self, genomes, nets, schedule):
+        self.maps = []
+        self.snakes = []
+        self.batch = None
+
+        # Slots of the games being played (in the same order as self.snakes), game of each slot as
+        # (genome index, episode) and steps taken in it
+        active = []
+        jobs = {}
+        steps = {}
+        env_steps = 0
+
+        free = list(range(self.NB_SNAKES))
+        while True:
+            # Start pending games in the free slots
+            for slot in free:
+                job = schedule.next(env_steps)
+                if job is None:
+                    break
+
+                i, episode = job
+                map = Map(self.NB_BLOCS_W, self.NB_BLOCS_H, slot % self.NB_MAPS_W, slot // self.NB_MAPS_W, COL_WALLS, COL_FRUITS,
+                    rng=seeding.env_rng(self.seed, self.gen, genomes[i][0], episode))
+                self.maps.append(map)
+                self.snakes.append(Snake(map, 2, COL_HEAD, COL_BODY, hunger_threshold=50))
+                active.append(slot)
+                jobs[slot] = job
+                steps[slot] = 0
+
+                if self.recorder is not None:
+                    self.start_recording(genomes, [slot], [job])
+            free = []
+
+            # Stop run if all snakes dead and nothing left to play
+            if len(self.snakes) == 0:
+                break
+
+            # Headless mode steps as fast as possible (no frame cap, no events, no drawing)
+            if not self.headless:
+                self.clock.tick(30)
+
+            if self.headless or time.time() - self.last_update > self.UPDATE_TIME:
+                if not self.headless:
+                    self.handle_events(handle_movement=False)       # Do not handle movement since AI takes care of that
+
+                self.timer.start()
 
                 if not self.paused:
-                    # Observe and take action for each snake
-                    for i in range(len(self.snakes)):
-                        is_empty, is_fruit = self.snakes[i].check_neighbours(n=5)
-                        is_empty = [n for row in is_empty for n in row]
-                        # is_fruit = [n for row in is_fruit for n in row]
-                        output = nets[i].activate([
-                            *is_empty,
-                            # *is_fruit,
-                            *self.snakes[i].distances_to_walls(),
-                            *self.snakes[i].distances_to_fruit(),
-                            self.snakes[i].x_vel,
-                            self.snakes[i].y_vel,
-                            *self.snakes[i].tail_vel(),
-                        ])
-
-                        th = 0.5
-                        if np.max(output) == output[0]:
-                            if output[0] > th:
-                                self.snakes[i].change_dir('up')
-                        elif np.max(output) == output[1]:
-                            if output[1] > th:
-                                self.snakes[i].change_dir('down')
-                        elif np.max(output) == output[2]:
-                            if output[2] > th:
-                                self.snakes[i].change_dir('left')
-                        elif np.max(output) == output[3]:
-                            if output[3] > th:
-                                self.snakes[i].change_dir('right')
+                    # Observe and take action for each snake (the snake of slot k plays genome jobs[k][0])
+                    obs = sensors.observe_snakes(self.snakes, n=5)
+                    self.timer.lap('sense')
+
+                    for j, slot in enumerate(active):
+                        output = nets[jobs[slot][0]].activate(obs[j])
+                        self.snakes[j].act(output, th=0.5)
+
+                    if self.recorder is not None:
+                        self.recorder.record(active, [snake.y_vel for snake in self.snakes], [snake.x_vel for snake in self.snakes])
+                    self.timer.lap('activate')
 
                     # Update game
                     self.update()
+                    env_steps += len(active)
+                    self.timer.lap('update')
 
-                    elems_to_remove = []
-                    # Reward good snakes and kill hungry ones
-                    for i in range(len(self.snakes)):
-                        if self.snakes[i].size > max_size:
-                            max_size = self.snakes[i].size
+                    alive = []
+                    # Kill hungry snakes, end the games that reached max_steps
+                    for j, slot in enumerate(active):
+                        snake = self.snakes[j]
+                        steps[slot] += 1
 
-                        if max_size > self.general_max_size:
-                            self.general_max_size = max_size
+                        if snake.size > self.max_size:
+                            self.max_size = snake.size
 
-                        if self.snakes[i].size > sizes[i]:
-                            # ge[i].fitness += 3
-                            sizes[i] = self.snakes[i].size
+                        if self.max_size > self.general_max_size:
+                            self.general_max_size = self.max_size
 
-                        if self.snakes[i].hungry:
-                            self.snakes[i].alive = False
-                            # ge[i].fitness -= 1.5
+                        if snake.hungry:
+                            snake.alive = False
+                            snake.steps -= 50
 
-                            self.snakes[i].steps -= 50
+                        elif snake.alive and steps[slot] == self.max_steps:
+                            snake.alive = False
 
-                        if not self.snakes[i].alive:
-                            # if not self.snakes[i].hungry:
-                                # ge[i].fitness -= 1
-                            elems_to_remove.append(i)
+                        alive.append(snake.alive)
+
+                    # Reward the snakes of the games over and free their slots in one pass
+                    if not all(alive):
+                        for slot, snake, a in zip(active, self.snakes, alive):
+                            if not a:
+                                i, episode = jobs.pop(slot)
+                                self.finish_episode(genomes, schedule, i, episode, ((snake.size - 2) ** 3) / snake.steps, steps[slot])
+                                free.append(slot)
+
+                                if self.recorder is not None:
+                                    self.finish_recording(slot, snake.size)
 
-                        ge[i].fitness = ((self.snakes[i].size - 2) ** 3) / self.snakes[i].steps
+                        active = [slot for slot, a in zip(active, alive) if a]
+                        self.snakes[:] = [snake for snake, a in zip(self.snakes, alive) if a]
+                        self.maps[:] = [map for map, a in zip(self.maps, alive) if a]
 
-                    # Remove dead snakes from lists
-                    sizes[:] = [sizes[i] for i in range(len(sizes)) if i not in elems_to_remove]
-                    self.snakes[:] = [self.snakes[i] for i in range(len(self.snakes)) if i not in elems_to_remove]
-                    self.maps[:] = [self.maps[i] for i in range(len(self.maps)) if i not in elems_to_remove]
-                    ge[:] = [ge[i] for i in range(len(ge)) if i not in elems_to_remove]
-                    nets[:] = [nets[i] for i in range(len(nets)) if i not in elems_to_remove]
+                    self.timer.lap('bookkeeping')
+
+                self.show()
+                self.timer.lap('draw')
+
+                self.last_update = time.time()
 
-                    # Stop run if all snakes dead
-                    if len(self.snakes) == 0:
+
+    # Same as play_episodes, with the slots simulated together in a SnakeBatch (environment k is slot k)
+    def play_episodes_batch(self, genomes, nets, schedule):
+        self.maps = []
+        self.snakes = []
+        self.batch = None
+
+        jobs = []
+        while len(jobs) < self.NB_SNAKES:
+            job = schedule.next()
+            if job is None:
+                break
+            jobs.append(job)
+
+        if len(jobs) == 0:
+            return
+
+        # Game of each environment (genome index and episode) and steps taken in it
+        job_genome = np.array([i for i, _ in jobs])
+        job_episode = np.array([episode for _, episode in jobs])
+        steps = np.zeros(len(jobs), dtype=int)
+        env_steps = 0
+
+        # Environments whose game is over, refilled once there are refill of them (or nothing else runs)
+        free = []
+        refill = max(1, len(jobs) // 8)
+
+        self.batch = SnakeBatch(len(jobs), self.NB_BLOCS_W, self.NB_BLOCS_H, 2, COL_WALLS, COL_FRUITS, COL_HEAD, COL_BODY, hunger_threshold=50, compiled=self.compiled,
+            rngs=[seeding.env_rng(self.seed, self.gen, genomes[i][0], episode) for i, episode in jobs],
+        )
+
+        if self.recorder is not None:
+            self.start_recording(genomes, range(len(jobs)), jobs)
+
+        # Main game loop
+        self.running = True
+        while self.running:
+            # Headless mode steps as fast as possible (no frame cap, no events, no drawing)
+            if not self.headless:
+                self.clock.tick(30)
+
+            if self.headless or time.time() - self.last_update > self.UPDATE_TIME:
+                if not self.headless:
+                    self.handle_events(handle_movement=False)       # Do not handle movement since AI takes care of that
+
+                self.timer.start()
+
+                if not self.paused:
+                    live = np.flatnonzero(self.batch.alive)
+
+                    # Observe and take action for each snake (strongest output, if above threshold)
+                    obs = self.batch.observe(live, n=5)
+                    self.timer.lap('sense')
+
+                    output = nets.activate(obs, job_genome[live])
+
+                    th = 0.5
+                    best = np.argmax(output, axis=1)
+                    dirs = np.full(len(job_genome), -1)
+                    dirs[live] = np.where(output[np.arange(len(live)), best] > th, best, -1)
+
+                    self.batch.change_dir(dirs)
+
+                    if self.recorder is not None:
+                        self.recorder.record(live, self.batch.y_vel[live], self.batch.x_vel[live])
+                    self.timer.lap('activate')
+
+                    # Update game (and kill hungry snakes), end the games that reached max_steps
+                    self.batch.update(hunger_penalty=50)
+                    steps[live] += 1
+                    env_steps += len(live)
+
+                    if self.max_steps is not None:
+                        self.batch.alive[live[steps[live] >= self.max_steps]] = False
+                    self.timer.lap('update')
+
+                    self.max_size = max(self.max_size, np.max(self.batch.size[live]))
+                    self.general_max_size = max(self.general_max_size, self.max_size)
+
+                    # Reward the snakes of the games over (size and steps do not change after death)
+                    over = live[~self.batch.alive[live]]
+                    if len(over) > 0:
+                        fitness = ((self.batch.size[over] - 2) ** 3) / self.batch.steps[over]
+                        for k, f in zip(over, fitness):
+                            self.finish_episode(genomes, schedule, job_genome[k], job_episode[k], float(f), int(steps[k]))
+                            free.append(k)
+
+                            if self.recorder is not None:
+                                self.finish_recording(k, self.batch.size[k])
+
+                    # Start pending games in the free environments, a few at a time (resetting environments
+                    # costs about the same for one or many)
+                    if len(free) >= refill or (len(free) > 0 and not np.any(self.batch.alive)):
+                        restart = []
+                        for k in free:
+                            job = schedule.next(env_steps)
+                            if job is None:
+                                break
+
+                            job_genome[k], job_episode[k] = job
+                            steps[k] = 0
+                            restart.append(k)
+                        free = free[len(restart):]
+
+                        if len(restart) > 0:
+                            self.batch.reset(restart, [seeding.env_rng(self.seed, self.gen, genomes[job_genome[k]][0], job_episode[k]) for k in restart])
+
+                            if self.recorder is not None:
+                                self.start_recording(genomes, restart, [(job_genome[k], job_episode[k]) for k in restart])
+
+                    # Stop run if all snakes dead and nothing left to play
+                    if not np.any(self.batch.alive):
                         self.running = False
 
-                self.draw(max_size=max_size, general_max_size=self.general_max_size, generation=self.gen)
+                    self.timer.lap('bookkeeping')
+
+                self.show()
+                self.timer.lap('draw')
 
                 self.last_update = time.time()
 
-        self.gen += 1
+
+    # Starts recording the games jobs ((genome index, episode) pairs) started in slots
+    def start_recording(self, genomes, slots, jobs):
+        self.recorder.start(
+            slots,
+            [seeding.env_seed(self.seed, self.gen, genomes[i][0], episode) for i, episode in jobs],
+            ['gen-{}-genome-{}-episode-{}'.format(self.gen, genomes[i][0], episode) for i, episode in jobs],
+        )
+
+
+    # Saves the game of a slot if its snake beat every snake seen so far
+    def finish_recording(self, slot, size):
+        path = self.recorder.finish(slot, size)
+        if path is not None:
+            print('Trace saved to {}'.format(path))
+
+
+    # Draws the current state on screen and / or shares it with viewers
+    def show(self):
+        if not self.headless:
+            self.draw(max_size=self.max_size, general_max_size=self.general_max_size, generation=self.gen)
+
+        if self.publisher is not None and self.publisher.due():
+            self.publisher.publish(self.frames(), self.gen, self.max_size, self.general_max_size)
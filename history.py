@@ -0,0 +1,100 @@
+import csv
+import time
+from collections import deque
+
+import neat
+import numpy as np
+
+
+# Reporter appending one row of aggregates per generation to a CSV file (flushed right away, so nothing is lost
+# if the training dies), instead of keeping every generation in memory like neat.StatisticsReporter
+# Only the last window rows and the best genome seen are kept in memory
+# counters is the Game or ParallelEvaluator evaluating the genomes (max_size, general_max_size, episodes_played)
+# append continues an existing file (resumed training), the generations written twice are deduplicated by load()
+class HistoryReporter(neat.reporting.BaseReporter):
+    QUANTILES = [0, 10, 25, 50, 75, 90, 100]
+    COLUMNS = (
+        ['generation', 'time', 'eval_time', 'gen_time', 'population', 'species', 'episodes'] +
+        ['fitness_p{}'.format(q) for q in QUANTILES] +
+        ['fitness_mean', 'fitness_std', 'max_size', 'general_max_size']
+    )
+
+    def __init__(self, counters, path, window=100, append=False):
+        self.counters = counters
+        self.window = deque(maxlen=window)
+        self.best_genome = None
+
+        self.file = open(path, 'a' if append else 'w', newline='')
+        self.writer = csv.writer(self.file)
+        if self.file.tell() == 0:
+            self.writer.writerow(self.COLUMNS)
+
+        self.start = time.time()
+        self.row = None
+
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.start_time = time.perf_counter()
+
+
+    def post_evaluate(self, config, population, species, best_genome):
+        fitness = np.array([genome.fitness for genome in population.values()], dtype=float)
+
+        if self.best_genome is None or best_genome.fitness > self.best_genome.fitness:
+            self.best_genome = best_genome
+
+        self.row = dict(zip(self.COLUMNS, [
+            self.generation,
+            time.time() - self.start,
+            time.perf_counter() - self.start_time,
+            None,
+            len(population),
+            len(species.species),
+            self.counters.episodes_played,
+        ] + list(np.percentile(fitness, self.QUANTILES)) + [
+            np.mean(fitness),
+            np.std(fitness),
+            self.counters.max_size,
+            self.counters.general_max_size,
+        ]))
+
+
+    # Generation time includes reproduction and speciation
+    def end_generation(self, config, population, species_set):
+        self.row['gen_time'] = time.perf_counter() - self.start_time
+        self.write()
+
+
+    def found_solution(self, config, generation, best):
+        self.write()
+
+
+    def write(self):
+        if self.row is None:
+            return
+
+        self.writer.writerow([self.row[column] for column in self.COLUMNS])
+        self.file.flush()
+
+        self.window.append(self.row)
+        self.row = None
+
+
+# Reads a history written by HistoryReporter as one numpy array per column (NaN where a value is missing)
+# Rows of generations written several times (resumed training) keep their last version
+def load(path):
+    with open(path, newline='') as f:
+        columns = next(csv.reader(f))
+        rows = f.readlines()
+
+    if len(rows) == 0:
+        data = np.empty((0, len(columns)))
+    else:
+        data = np.genfromtxt(rows, delimiter=',', ndmin=2)
+
+        generations = data[:, columns.index('generation')]
+        _, last = np.unique(generations[::-1], return_index=True)
+        data = data[len(data) - 1 - last]
+
+    return {column: data[:, i] for i, column in enumerate(columns)}
@@ -0,0 +1,75 @@
+import importlib.util
+
+from map import Map
+
+# Numba is optional: without it the same functions run as plain (slow) python
+# It is only imported when a kernel is first used (see compiled), so importing this module stays cheap
+NUMBA_AVAILABLE = importlib.util.find_spec('numba') is not None
+
+_compiled = {}
+
+
+# Compiled version of a kernel (the kernel itself without Numba)
+# Compiled kernels are cached on disk (__pycache__), so only the first run ever pays for compilation
+def compiled(kernel):
+    if kernel not in _compiled:
+        if NUMBA_AVAILABLE:
+            from numba import njit
+            _compiled[kernel] = njit(cache=True)(kernel)
+        else:
+            _compiled[kernel] = kernel
+
+    return _compiled[kernel]
+
+
+# Possible states of each bloc (those of Map, Numba treats these globals as compile-time constants)
+EMPTY, WALL, FRUIT, SNAKE = Map.EMPTY, Map.WALL, Map.FRUIT, Map.SNAKE
+
+
+# Advances every living snake by one step, on the arrays of a SnakeBatch
+# Handles movement, collisions, eating (growth) and hunger (hungry snakes are killed if hunger_penalty >= 0)
+# Fruits eaten are spawned again by the caller (SnakeBatch.spawn_fruits), to use the same random draws as Map
+# Run through compiled(step)
+def step(grid, body_y, body_x, head, size, y_vel, x_vel, changed_dir, fruit_on_map, alive, steps, steps_without_eating, hungry, hunger_th, hunger_penalty):
+    nb_envs, map_h, map_w = grid.shape
+    capacity = body_y.shape[1]
+
+    for i in range(nb_envs):
+        if not alive[i]:
+            continue
+
+        changed_dir[i] = False
+
+        next_y = (body_y[i, head[i]] + y_vel[i]) % map_h
+        next_x = (body_x[i, head[i]] + x_vel[i]) % map_w
+        target = grid[i, next_y, next_x]
+
+        # Die if hits wall or self
+        if target == WALL or target == SNAKE:
+            alive[i] = False
+
+        else:
+            # Grow if eats fruit (the tail stays), otherwise free the tail cell
+            if target == FRUIT:
+                size[i] += 1
+                steps_without_eating[i] = -1
+                fruit_on_map[i] = False
+            else:
+                tail = (head[i] - size[i] + 1) % capacity
+                grid[i, body_y[i, tail], body_x[i, tail]] = EMPTY
+
+            # Push the new head
+            head[i] = (head[i] + 1) % capacity
+            body_y[i, head[i]] = next_y
+            body_x[i, head[i]] = next_x
+            grid[i, next_y, next_x] = SNAKE
+
+            steps[i] += 1
+            steps_without_eating[i] += 1
+
+        hungry[i] = steps_without_eating[i] > hunger_th
+
+        # Kill hungry snakes
+        if hungry[i] and hunger_penalty >= 0:
+            alive[i] = False
+            steps[i] -= hunger_penalty
@@ -1,11 +1,20 @@
 from game import Game
+from evaluation import ParallelEvaluator
+from profiling import ProfileReporter
+from cache import FitnessCache
+from recording import TraceRecorder
+from history import HistoryReporter
+import checkpoint
+import farm
 import neat
 
 import pickle
+import random
 
 import numpy as np
 
 import os
+import argparse
 
 WIN_W = 600
 WIN_H = 600
@@ -22,7 +31,10 @@ NB_BLOCS_H = 12
 
 # main()
 
-def run(config_path, winner_path, nb_runs):
+def run(config_path, winner_path, nb_runs, headless=False, batched=False, compiled=False, workers=1, publish=False, profile_path=None, seed=None,
+        episodes=1, aggregate='mean', early_stop=False, step_budget=None, step_cap=None, cache=False, cache_episodes=None, trace_dir=None,
+        history_path=None, checkpoint_dir=None, checkpoint_every=None, checkpoint_seconds=300, resume_path=None,
+        farm_address=None, farm_workers=0, farm_key=None, farm_batch=8, farm_timeout=60):
     config = neat.config.Config(
         neat.DefaultGenome,
         neat.DefaultReproduction,
@@ -35,18 +47,88 @@ def run(config_path, winner_path, nb_runs):
     w = NB_MAPS_W
     h = int(np.ceil(n/w))
 
-    game = Game(WIN_W, WIN_H, n, w, h, NB_BLOCS_W, NB_BLOCS_H, 1/2000)
-
-    pop = neat.Population(config)
+    # Games end after step_cap steps per bloc of the map (inside of the walls)
+    max_steps = int(step_cap * (NB_BLOCS_W - 2) * (NB_BLOCS_H - 2)) if step_cap is not None else None
+
+    # Genomes are evaluated by the workers of a farm, listening on farm_address (host:port) (always headless)
+    game = None
+    if farm_address is not None:
+        evaluator = farm.FarmEvaluator(farm_address, farm_key, local_workers=farm_workers, batch_size=farm_batch, timeout=farm_timeout,
+            seed=seed, episodes=episodes, aggregate=aggregate, early_stop=early_stop, max_steps=max_steps, map_w=NB_BLOCS_W, map_h=NB_BLOCS_H)
+        eval_function = evaluator.evaluate
+        counters = evaluator
+    # Several workers evaluate genomes in parallel processes (always headless)
+    elif workers > 1:
+        evaluator = ParallelEvaluator(workers, seed=seed, episodes=episodes, aggregate=aggregate, early_stop=early_stop, max_steps=max_steps,
+            map_w=NB_BLOCS_W, map_h=NB_BLOCS_H)
+        eval_function = evaluator.evaluate
+        counters = evaluator
+    else:
+        game = Game(WIN_W, WIN_H, n, w, h, NB_BLOCS_W, NB_BLOCS_H, 1/2000, headless=headless, batched=batched, compiled=compiled, publish=publish, seed=seed,
+            episodes=episodes, aggregate=aggregate, early_stop=early_stop, step_budget=step_budget, max_steps=max_steps)
+        game.gen = 0
+        game.general_max_size = 0
+        eval_function = game.run_neat
+        counters = game
+
+    # Start from scratch or from a checkpoint (population, species, random generators and counters)
+    if resume_path is not None:
+        pop = checkpoint.restore(resume_path, counters)
+        print('Resuming from {} (generation {})'.format(resume_path, pop.generation))
+    else:
+        # neat draws the initial population, mutations and crossovers from the random module: seed it too
+        # so that the run seed reproduces the whole training (a checkpoint restores its state instead)
+        random.seed(counters.seed)
+        pop = neat.Population(config)
+
+    print('Run seed: {}'.format(counters.seed))
+
+    # Early stopping compares genomes with the elites of their species
+    counters.species_set = pop.species
+
+    # Unchanged genomes (elites...) reuse the episodes they already played
+    if cache:
+        counters.cache = FitnessCache(max_episodes=cache_episodes)
 
     pop.add_reporter(neat.StdOutReporter(True))
-    stats = neat.StatisticsReporter()
-    pop.add_reporter(stats)
-
-    game.gen = 0
-    game.general_max_size = 0
 
-    winner = pop.run(game.run_neat, nb_runs)
+    # Statistics of each generation, appended to a CSV file (read it back with history.load)
+    if history_path is not None:
+        pop.add_reporter(HistoryReporter(counters, history_path, append=resume_path is not None))
+
+    # Frames are published by Game, so only for single process training
+    if publish and game is None:
+        print('Publishing frames is only available without --workers or --farm')
+
+    # Time per phase of each generation (timers live in Game, so only for single process training)
+    if profile_path is not None:
+        if game is None:
+            print('Profiling is only available without --workers or --farm')
+        else:
+            pop.add_reporter(ProfileReporter(game, profile_path))
+
+    # Episodes beating the largest snake so far are saved as traces (played with recording.py)
+    if trace_dir is not None:
+        if game is None:
+            print('Recording traces is only available without --workers or --farm')
+        else:
+            game.recorder = TraceRecorder(trace_dir, NB_BLOCS_W, NB_BLOCS_H, 2, 50, 50)
+
+    checkpointer = None
+    if checkpoint_dir is not None:
+        checkpointer = checkpoint.Checkpointer(pop, counters, checkpoint_dir, checkpoint_every, checkpoint_seconds)
+        pop.add_reporter(checkpointer)
+
+    # Ctrl-C or closing the window (quit()) saves the population being evaluated
+    try:
+        winner = pop.run(eval_function, nb_runs - pop.generation)
+    except (KeyboardInterrupt, SystemExit):
+        if checkpointer is not None:
+            checkpointer.save_now()
+        raise
+    finally:
+        if checkpointer is not None:
+            checkpointer.join()
 
     # Save winner to file
     with open(winner_path, 'wb') as f:
@@ -63,11 +145,16 @@ def replay_genome(config_path, genome_path):
         config_path
     )
 
-    game = Game(WIN_W, WIN_H, 1, 1, 1, NB_BLOCS_W, NB_BLOCS_H, 1/20)
-
     with open(genome_path, "rb") as f:
         genome = pickle.load(f)
 
+    watch_genome(config, genome)
+
+
+# Plays one game with the genome in a window, at 20 steps per second
+def watch_genome(config, genome):
+    game = Game(WIN_W, WIN_H, 1, 1, 1, NB_BLOCS_W, NB_BLOCS_H, 1/20)
+
     genomes = [(1, genome)]
 
     game.gen = 0
@@ -76,9 +163,52 @@ def replay_genome(config_path, genome_path):
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--headless', action='store_true', help='train without opening a window or throttling frames')
+    parser.add_argument('--batched', action='store_true', help='simulate the whole population at once with numpy arrays')
+    parser.add_argument('--compiled', action='store_true', help='step the batched simulation with the Numba kernel')
+    parser.add_argument('--workers', type=int, default=1, help='number of processes evaluating genomes in parallel')
+    parser.add_argument('--farm', nargs='?', const=farm.DEFAULT_ADDRESS, help='evaluate genomes on farm workers (python farm.py HOST:PORT) connecting to this address')
+    parser.add_argument('--farm-workers', type=int, default=0, help='farm workers started on this machine')
+    parser.add_argument('--farm-key', default=os.environ.get('SNAKE_FARM_KEY'), help='key shared with the farm workers (SNAKE_FARM_KEY by default, a random one is printed if none is given and the farm is not on localhost)')
+    parser.add_argument('--farm-batch', type=int, default=8, help='genomes sent to a farm worker at once')
+    parser.add_argument('--farm-timeout', type=float, default=60, help='seconds after which a batch is sent to another farm worker')
+    parser.add_argument('--publish', nargs='?', const=True, metavar='NAME', help='share the simulation state with viewer.py (attach or detach a viewer at any time), under NAME to run several trainings (viewer.py --name NAME)')
+    parser.add_argument('--profile', nargs='?', const='profile.csv', help='write time per phase, env steps and survival curve of each generation (.csv or .jsonl)')
+    parser.add_argument('--seed', type=int, help='seed of the games played by the genomes (random by default)')
+    parser.add_argument('--episodes', type=int, default=1, help='games played by each genome per generation')
+    parser.add_argument('--aggregate', default='mean', choices=['mean', 'min', 'median'], help='how the fitnesses of the games are combined')
+    parser.add_argument('--early-stop', action='store_true', help='stop playing games with genomes that can no longer beat their species elite')
+    parser.add_argument('--step-budget', type=int, help='env steps per generation after which no new game is started (single process)')
+    parser.add_argument('--step-cap', type=float, help='end games after this many steps per bloc of the map (so no single snake holds up a generation)')
+    parser.add_argument('--cache', action='store_true', help='reuse the games already played by unchanged genomes')
+    parser.add_argument('--cache-episodes', type=int, help='games kept per genome in the cache (more than --episodes adds new games each generation)')
+    parser.add_argument('--history', default='history.csv', help='CSV file the statistics of each generation are appended to')
+    parser.add_argument('--record', action='store_true', help='save the episodes of new largest snakes to traces/ (watch them with recording.py)')
+    parser.add_argument('--checkpoint-every', type=int, help='save a checkpoint every N generations')
+    parser.add_argument('--checkpoint-seconds', type=float, default=300, help='save a checkpoint every T seconds')
+    parser.add_argument('--resume', nargs='?', const='latest', help='resume from a checkpoint (the latest one by default)')
+    args = parser.parse_args()
+
     local_dir = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, 'config-feedforward.txt')
     winner_path = os.path.join(local_dir, 'winner.pkl')
-
-    run(config_path, winner_path, nb_runs = 5000)
+    profile_path = os.path.join(local_dir, args.profile) if args.profile else None
+    checkpoint_dir = os.path.join(local_dir, 'checkpoints')
+    trace_dir = os.path.join(local_dir, 'traces') if args.record else None
+    history_path = os.path.join(local_dir, args.history)
+
+    resume_path = args.resume
+    if resume_path == 'latest':
+        paths = checkpoint.checkpoints(checkpoint_dir)
+        if paths:
+            resume_path = paths[-1]
+        else:
+            print('No checkpoint in {}, starting a new training'.format(checkpoint_dir))
+            resume_path = None
+
+    run(config_path, winner_path, nb_runs = 5000, headless=args.headless, batched=args.batched, compiled=args.compiled, workers=args.workers, publish=args.publish, profile_path=profile_path, seed=args.seed,
+        episodes=args.episodes, aggregate=args.aggregate, early_stop=args.early_stop, step_budget=args.step_budget, step_cap=args.step_cap, cache=args.cache, cache_episodes=args.cache_episodes, trace_dir=trace_dir,
+        history_path=history_path, checkpoint_dir=checkpoint_dir, checkpoint_every=args.checkpoint_every, checkpoint_seconds=args.checkpoint_seconds, resume_path=resume_path,
+        farm_address=args.farm, farm_workers=args.farm_workers, farm_key=args.farm_key, farm_batch=args.farm_batch, farm_timeout=args.farm_timeout)
     # replay_genome(config_path, winner_path)
@@ -1,59 +1,61 @@
-import pygame
 import numpy as np
 
 # Structure for each map in the game
+# Slots and class constants keep the per-map overhead small (thousands of environments are simulated at once)
 class Map:
-    def __init__(self, map_w, map_h, pos_x, pos_y, col_walls, col_fruits):
+    __slots__ = ('MAP_W', 'MAP_H', 'POS_X', 'POS_Y', 'COL_WALLS', 'COL_FRUITS', 'rng', 'map', 'fruit_pos_x', 'fruit_pos_y', 'fruit_on_map')
+
+    # Possible states of each bloc
+    EMPTY = 0
+    WALL = 1
+    FRUIT = 2
+    SNAKE = 3
+
+    def __init__(self, map_w, map_h, pos_x, pos_y, col_walls, col_fruits, rng=None):
         # Initiate map properties
         self.MAP_W, self.MAP_H = map_w, map_h
         self.POS_X, self.POS_Y = pos_x, pos_y
         self.COL_WALLS, self.COL_FRUITS = col_walls, col_fruits
 
-        # Possible states of each bloc
-        self.EMPTY = 0
-        self.WALL = 1
-        self.FRUIT = 2
-        self.SNAKE = 3
+        # Random generator of this environment (fruits here, and the snake put on the map), see seeding.py
+        self.rng = rng if rng is not None else np.random.default_rng()
 
-        # Map creation (walls on the edges, rest is empty)
-        self.map = np.zeros(shape=(self.MAP_H, self.MAP_W))
-        for i in range(self.MAP_H):
-            for j in range(self.MAP_W):
-                if i == 0 or j == 0 or i == self.MAP_H-1 or j == self.MAP_W-1:
-                    self.map[i][j] = self.WALL
-                else:
-                    self.map[i][j] = self.EMPTY
+        # Map creation (walls on the edges, rest is empty), one byte per bloc as in SnakeBatch
+        self.map = np.full((self.MAP_H, self.MAP_W), self.WALL, dtype=np.int8)
+        self.map[1:-1, 1:-1] = self.EMPTY
 
         # Putting first fruit on map
         self.fruit_pos_x = 0
         self.fruit_pos_y = 0
+        self.fruit_on_map = False
 
-        while self.map[self.fruit_pos_y][self.fruit_pos_x] != self.EMPTY:
-            self.fruit_pos_x = np.random.randint(1, self.MAP_W-1)
-            self.fruit_pos_y = np.random.randint(1, self.MAP_H-1)
-
-        self.map[self.fruit_pos_y][self.fruit_pos_x] = self.FRUIT
-        self.fruit_on_map = True
+        self.spawn_fruit()
 
     
     # Updates the map at each call
     def update(self):
-        # If there's no fruit on the map, delete the previous one from it and spawn a new one
+        # If there's no fruit on the map, spawn a new one
         if not self.fruit_on_map:
-            # Delete previous fruit from map
-            # self.map[self.fruit_pos_y][self.fruit_pos_x] = self.EMPTY
+            self.spawn_fruit()
+
+
+    # Puts a fruit on a bloc picked at random among the empty ones
+    # If the map is full there is nowhere to put it: fruit_on_map stays False and the next update tries again
+    def spawn_fruit(self):
+        free = np.flatnonzero(self.map == self.EMPTY)
+        if len(free) == 0:
+            return
 
-            # Spawn fruit if random position is not on wall
-            while self.map[self.fruit_pos_y][self.fruit_pos_x] != self.EMPTY:
-                self.fruit_pos_x = np.random.randint(1, self.MAP_W-1)
-                self.fruit_pos_y = np.random.randint(1, self.MAP_H-1)
+        self.fruit_pos_y, self.fruit_pos_x = divmod(free[self.rng.integers(len(free))], self.MAP_W)
 
-            self.map[self.fruit_pos_y][self.fruit_pos_x] = self.FRUIT
-            self.fruit_on_map = True
+        self.map[self.fruit_pos_y][self.fruit_pos_x] = self.FRUIT
+        self.fruit_on_map = True
 
     
     # Draws the map at the specified position on the window
     def draw(self, win, bloc_size_x, bloc_size_y):
+        import pygame
+
         p = 0.75
         
         map_pos_x_px = bloc_size_x * self.MAP_W * self.POS_X
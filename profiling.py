@@ -0,0 +1,109 @@
+import csv
+import json
+import time
+
+import neat
+
+
+# Accumulates the time spent in each phase of a loop
+# start() marks the beginning of an iteration, lap(name) charges the time since the previous mark to name
+# A disabled timer returns right away (no clock read), so it can stay in hot loops
+class PhaseTimer:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.totals = {}
+        self.last = time.perf_counter()
+
+
+    def start(self):
+        if not self.enabled:
+            return
+
+        self.last = time.perf_counter()
+
+
+    def lap(self, name):
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        self.totals[name] = self.totals.get(name, 0) + now - self.last
+        self.last = now
+
+
+    def reset(self):
+        self.totals = {}
+        self.start()
+
+
+# Reporter writing where the time of each generation went, from the timers of a Game
+# One row per generation: generation and evaluation times, time per phase of run_neat,
+# env steps, episodes played and the survival curve (snakes alive at each step, summed over episodes)
+# Written as CSV or JSON lines depending on the extension of path
+class ProfileReporter(neat.reporting.BaseReporter):
+    PHASES = ['sense', 'activate', 'update', 'bookkeeping', 'draw']
+
+    def __init__(self, game, path):
+        self.game = game
+        self.game.timer.enabled = True
+
+        self.jsonl = path.endswith('.jsonl')
+        self.file = open(path, 'w', newline='')
+        if not self.jsonl:
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(['generation', 'gen_time', 'eval_time'] + self.PHASES + ['env_steps', 'steps_per_sec', 'episodes', 'episode_steps', 'survival'])
+
+        self.row = None
+
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.start_time = time.perf_counter()
+        self.start_totals = dict(self.game.timer.totals)
+        self.start_steps = self.game.env_steps
+
+
+    def post_evaluate(self, config, population, species, best_genome):
+        eval_time = time.perf_counter() - self.start_time
+        totals = self.game.timer.totals
+        env_steps = self.game.env_steps - self.start_steps
+
+        self.row = {
+            'generation': self.generation,
+            'gen_time': None,
+            'eval_time': eval_time,
+            'phases': {phase: totals.get(phase, 0) - self.start_totals.get(phase, 0) for phase in self.PHASES},
+            'env_steps': env_steps,
+            'steps_per_sec': env_steps / eval_time if eval_time > 0 else 0,
+            'episodes': self.game.episodes_played,
+            'survival': list(self.game.alive_counts),
+        }
+
+
+    # Generation time includes reproduction and speciation
+    def end_generation(self, config, population, species_set):
+        self.row['gen_time'] = time.perf_counter() - self.start_time
+        self.write()
+
+
+    def found_solution(self, config, generation, best):
+        self.write()
+
+
+    def write(self):
+        row = self.row
+        if row is None:
+            return
+
+        if self.jsonl:
+            self.file.write(json.dumps(row) + '\n')
+        else:
+            self.writer.writerow(
+                [row['generation'], row['gen_time'], row['eval_time']] +
+                [row['phases'][phase] for phase in self.PHASES] +
+                [row['env_steps'], row['steps_per_sec'], row['episodes'], len(row['survival']), ' '.join(map(str, row['survival']))]
+            )
+
+        # Rows are available while the training runs
+        self.file.flush()
+        self.row = None
@@ -0,0 +1,217 @@
+import os
+import time
+import struct
+import argparse
+
+import numpy as np
+
+from map import Map
+from snake import Snake
+
+
+# Episodes stored as the seed of their environment and the direction the snake moved in at each step:
+# replaying the moves on a Map / Snake seeded the same way rebuilds every state (fruits included)
+#
+# Binary format (little endian):
+#   header   magic 'SNKT', version, number of seed entries, map width, map height, initial size,
+#            hunger threshold, hunger penalty, number of steps, final size
+#   seed     one uint64 per entry (see seeding.env_seed)
+#   moves    2 bits per step (up, down, left, right), 4 steps per byte
+
+MAGIC = b'SNKT'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHHHHHIH')
+
+# Velocity (y, x) of each move code
+MOVES = np.array([[-1, 0], [1, 0], [0, -1], [0, 1]])
+
+
+# Move codes of snakes going at velocities (y_vel, x_vel)
+def move_codes(y_vel, x_vel):
+    y_vel, x_vel = np.asarray(y_vel), np.asarray(x_vel)
+    return np.where(y_vel != 0, y_vel > 0, 2 + (x_vel > 0)).astype(np.uint8)
+
+
+class Trace:
+    def __init__(self, seed, map_w, map_h, size, hunger_threshold, hunger_penalty, moves, final_size):
+        self.seed = [int(s) for s in seed]
+        self.map_w, self.map_h = map_w, map_h
+        self.size = size
+        self.hunger_threshold = hunger_threshold
+        self.hunger_penalty = hunger_penalty
+        self.moves = np.asarray(moves, dtype=np.uint8)
+        self.final_size = final_size
+
+
+    def save(self, path):
+        moves = np.zeros(-(-len(self.moves) // 4) * 4, dtype=np.uint8)
+        moves[:len(self.moves)] = self.moves
+        packed = moves[0::4] | (moves[1::4] << 2) | (moves[2::4] << 4) | (moves[3::4] << 6)
+
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(self.seed), self.map_w, self.map_h, self.size,
+                self.hunger_threshold, self.hunger_penalty, len(self.moves), self.final_size))
+            f.write(struct.pack('<{}Q'.format(len(self.seed)), *self.seed))
+            f.write(packed.tobytes())
+
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version, nb_seed, map_w, map_h, size, hunger_threshold, hunger_penalty, nb_steps, final_size = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a trace (version {})'.format(path, VERSION))
+
+        seed = struct.unpack_from('<{}Q'.format(nb_seed), data, HEADER.size)
+        packed = np.frombuffer(data, dtype=np.uint8, offset=HEADER.size + 8 * nb_seed)
+        moves = np.stack([packed & 3, (packed >> 2) & 3, (packed >> 4) & 3, packed >> 6], axis=1).ravel()[:nb_steps]
+
+        return cls(seed, map_w, map_h, size, hunger_threshold, hunger_penalty, moves, final_size)
+
+
+    # Map and snake at the start of the episode, placed at (pos_x, pos_y) in a grid of maps
+    def start(self, pos_x=0, pos_y=0):
+        map = Map(self.map_w, self.map_h, pos_x, pos_y, [255, 255, 255], [255, 0, 255], rng=np.random.default_rng(self.seed))
+        snake = Snake(map, self.size, [255, 0, 0], [0, 255, 255], hunger_threshold=self.hunger_threshold)
+
+        return map, snake
+
+
+    # Plays the next move (same step as Game.run_neat: move, update map, kill if hungry)
+    def step(self, map, snake, t):
+        snake.y_vel, snake.x_vel = MOVES[self.moves[t]]
+
+        snake.update()
+        map.update()
+
+        if snake.hungry:
+            snake.alive = False
+            snake.steps -= self.hunger_penalty
+
+
+    # Map and snake after the first t steps
+    def seek(self, t):
+        map, snake = self.start()
+        for k in range(min(t, len(self.moves))):
+            self.step(map, snake, k)
+
+        return map, snake
+
+
+# Keeps the moves of the games being played and saves the notable ones as traces:
+# the games whose snake beats the largest snake seen so far (best_size, raised by the caller to general_max_size)
+# Games are played in slots (environments of the simulation), a slot starts a new game once its game is over
+class TraceRecorder:
+    def __init__(self, directory, map_w, map_h, size, hunger_threshold, hunger_penalty):
+        self.directory = directory
+        self.map_w, self.map_h = map_w, map_h
+        self.size = size
+        self.hunger_threshold = hunger_threshold
+        self.hunger_penalty = hunger_penalty
+        self.best_size = size
+
+        # Seed, name (used in the file name of its trace) and moves of the game of each slot
+        self.games = {}
+
+        os.makedirs(directory, exist_ok=True)
+
+
+    def start(self, slots, seeds, names):
+        for slot, seed, name in zip(slots, seeds, names):
+            self.games[slot] = (seed, name, [])
+
+
+    # Moves of the games of slots at this step, read from the velocities the snakes are about to move with
+    def record(self, slots, y_vel, x_vel):
+        for slot, move in zip(slots, move_codes(y_vel, x_vel)):
+            self.games[slot][2].append(move)
+
+
+    # Saves the trace of the game of slot if its snake is a new record, returns its path (None otherwise)
+    def finish(self, slot, size):
+        seed, name, moves = self.games.pop(slot)
+        if size <= self.best_size:
+            return None
+
+        self.best_size = size
+        trace = Trace(seed, self.map_w, self.map_h, self.size, self.hunger_threshold, self.hunger_penalty, moves, int(size))
+
+        path = os.path.join(self.directory, '{}-size-{}.trace'.format(name, int(size)))
+        trace.save(path)
+
+        return path
+
+
+# Plays a trace in a window: space pauses, left / right step back / forward (while paused),
+# up / down double / halve the speed, home goes back to the start, escape quits
+def play(path, speed=10, start=0, win_size=600):
+    import pygame
+
+    trace = Trace.load(path)
+
+    pygame.init()
+    win = pygame.display.set_mode((win_size, win_size))
+    font = pygame.font.SysFont(None, 24)
+    clock = pygame.time.Clock()
+
+    bloc_size_x, bloc_size_y = win_size / trace.map_w, win_size / trace.map_h
+
+    t = min(start, len(trace.moves))
+    map, snake = trace.seek(t)
+    paused = False
+    last_step = time.time()
+
+    while True:
+        clock.tick(60)
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYUP and event.key == pygame.K_ESCAPE):
+                pygame.quit()
+                return
+
+            if event.type == pygame.KEYUP:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_UP:
+                    speed *= 2
+                elif event.key == pygame.K_DOWN:
+                    speed = max(speed / 2, 0.5)
+                elif event.key == pygame.K_HOME:
+                    t = 0
+                    map, snake = trace.seek(t)
+                elif event.key == pygame.K_LEFT and paused and t > 0:
+                    t -= 1
+                    map, snake = trace.seek(t)
+                elif event.key == pygame.K_RIGHT and paused and t < len(trace.moves):
+                    trace.step(map, snake, t)
+                    t += 1
+
+        if not paused and t < len(trace.moves) and time.time() - last_step > 1 / speed:
+            trace.step(map, snake, t)
+            t += 1
+            last_step = time.time()
+
+        win.fill((0, 0, 0))
+        map.draw(win, bloc_size_x, bloc_size_y)
+        snake.draw(win, bloc_size_x, bloc_size_y)
+        text = 'Step {}/{}  size {}/{}  x{:g}{}'.format(t, len(trace.moves), snake.size, trace.final_size, speed, '  (paused)' if paused else '')
+        win.blit(font.render(text, True, (255, 255, 255)), (10, 10))
+        pygame.display.update()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play an episode recorded with main.py --record')
+    parser.add_argument('trace', help='trace file')
+    parser.add_argument('--speed', type=float, default=10, help='steps per second')
+    parser.add_argument('--start', type=int, default=0, help='step to start from')
+    parser.add_argument('--check', action='store_true', help='replay without a window and check the final size')
+    args = parser.parse_args()
+
+    if args.check:
+        trace = Trace.load(args.trace)
+        map, snake = trace.seek(len(trace.moves))
+        print('{} steps, final size {} (recorded {}), {}'.format(len(trace.moves), snake.size, trace.final_size, 'ok' if snake.size == trace.final_size else 'MISMATCH'))
+    else:
+        play(args.trace, args.speed, args.start)
@@ -0,0 +1,167 @@
+import pygame
+import numpy as np
+
+from map import Map
+
+
+# Draws the maps on the window by only repainting the blocs that changed since the previous frame
+# Walls are pre-rendered once on a tile, fonts are cached and so is the last text drawn at each position
+class Renderer:
+    # Possible states of each bloc (those of Map), plus the snakes' heads
+    EMPTY, WALL, FRUIT, SNAKE = Map.EMPTY, Map.WALL, Map.FRUIT, Map.SNAKE
+    HEAD = 4
+
+    UNKNOWN = -1        # Bloc that has to be repainted
+
+    def __init__(self, win, nb_maps_w, nb_maps_h, map_w, map_h, bloc_size_x, bloc_size_y, col_walls, col_fruits, col_head, col_body):
+        self.win = win
+        self.NB_MAPS_W, self.NB_MAPS_H = nb_maps_w, nb_maps_h
+        self.MAP_W, self.MAP_H = map_w, map_h
+        self.bloc_size_x, self.bloc_size_y = bloc_size_x, bloc_size_y
+
+        # Color and size ratio of each bloc state (walls and fruits are smaller than snakes)
+        self.styles = {
+            self.WALL: (col_walls, 0.75),
+            self.FRUIT: (col_fruits, 0.75),
+            self.SNAKE: (col_body, 1),
+            self.HEAD: (col_head, 1),
+        }
+
+        # What is currently shown on screen for each bloc of each map, and which maps are shown
+        self.shown = np.full((nb_maps_w * nb_maps_h, map_h, map_w), self.UNKNOWN, dtype=np.int8)
+        self.visible = np.zeros(nb_maps_w * nb_maps_h, dtype=bool)
+
+        # Empty map (walls only), blitted when a map appears
+        self.tile_state = np.full((map_h, map_w), self.WALL, dtype=np.int8)
+        self.tile_state[1:-1, 1:-1] = self.EMPTY
+
+        self.tile = pygame.Surface((int(bloc_size_x * map_w), int(bloc_size_y * map_h)))
+        self.tile.fill((0, 0, 0))
+        for y, x in np.argwhere(self.tile_state == self.WALL):
+            self.draw_bloc(self.tile, 0, 0, y, x, self.WALL)
+
+        # Pixel position of every bloc of every map
+        maps = np.arange(nb_maps_w * nb_maps_h)
+        self.bloc_x = (bloc_size_x * map_w * (maps % nb_maps_w))[:, None, None] + bloc_size_x * np.arange(map_w)[None, None, :]
+        self.bloc_y = (bloc_size_y * map_h * (maps // nb_maps_w))[:, None, None] + bloc_size_y * np.arange(map_h)[None, :, None]
+
+        self.fonts = {}
+        self.texts = {}             # (position, size) -> (string, rendered string)
+        self.shown_texts = []
+        self.text_area = None
+
+
+    # Pixel position of the top left corner of map k
+    def map_pos(self, k):
+        return self.bloc_size_x * self.MAP_W * (k % self.NB_MAPS_W), self.bloc_size_y * self.MAP_H * (k // self.NB_MAPS_W)
+
+
+    # Paints one bloc (erasing what was there before), returns the rectangle that changed
+    def draw_bloc(self, surface, map_pos_x_px, map_pos_y_px, y, x, state):
+        pos_x = int(map_pos_x_px + self.bloc_size_x * x)
+        pos_y = int(map_pos_y_px + self.bloc_size_y * y)
+        rect = pygame.Rect(pos_x, pos_y, int(self.bloc_size_x), int(self.bloc_size_y))
+
+        surface.fill((0, 0, 0), rect)
+
+        if state in self.styles:
+            col, p = self.styles[state]
+            pygame.draw.rect(
+                surface,
+                col,
+                [
+                    int(map_pos_x_px + self.bloc_size_x * x + (1 - p) * self.bloc_size_x / 2),
+                    int(map_pos_y_px + self.bloc_size_y * y + (1 - p) * self.bloc_size_y / 2),
+                    int(p * self.bloc_size_x),
+                    int(p * self.bloc_size_y),
+                ]
+            )
+
+        return rect
+
+
+    # Rendered text, only rendered again when the string shown at this position changes
+    # (texts like the generation change all the time, keeping every string ever drawn would grow without bound)
+    def text(self, string, size, pos):
+        cached = self.texts.get((pos, size))
+        if cached is None or cached[0] != string:
+            if size not in self.fonts:
+                self.fonts[size] = pygame.font.SysFont('comicsans', size)
+            cached = (string, self.fonts[size].render(string, 1, (255, 255, 255)))
+            self.texts[pos, size] = cached
+
+        return cached[1]
+
+
+    # Blocs (of every map) that overlap the given rectangle
+    def blocs_in(self, rect):
+        return (
+            (self.bloc_x < rect.right) & (self.bloc_x + self.bloc_size_x > rect.left) &
+            (self.bloc_y < rect.bottom) & (self.bloc_y + self.bloc_size_y > rect.top)
+        )
+
+
+    # Draws a frame: frames holds (map index, grid, head y, head x) for each map to show, others are blanked
+    # texts holds (string, font size, position) for the info texts drawn on top
+    def draw(self, frames, texts):
+        dirty = []
+        refresh_texts = texts != self.shown_texts
+
+        # Blank the maps that are no longer shown, put the walls of the new ones
+        shown_now = np.zeros_like(self.visible)
+        shown_now[[k for k, _, _, _ in frames]] = True
+
+        for k in np.flatnonzero(self.visible & ~shown_now):
+            rect = pygame.Rect(*self.map_pos(k), self.tile.get_width(), self.tile.get_height())
+            self.win.fill((0, 0, 0), rect)
+            dirty.append(rect)
+
+        for k in np.flatnonzero(~self.visible & shown_now):
+            self.win.blit(self.tile, self.map_pos(k))
+            self.shown[k] = self.tile_state
+            dirty.append(pygame.Rect(*self.map_pos(k), self.tile.get_width(), self.tile.get_height()))
+
+        refresh_texts = refresh_texts or len(dirty) > 0
+        self.visible = shown_now
+
+        # Compare what is to be shown with what is on screen
+        views = []
+        for k, grid, head_y, head_x in frames:
+            view = grid.astype(np.int8)
+            view[head_y, head_x] = self.HEAD
+            views.append((k, view))
+
+            if not refresh_texts and self.text_area is not None:
+                refresh_texts = np.any((view != self.shown[k]) & self.under_texts[k])
+
+        # Texts are drawn over the maps: clear them and repaint the blocs below
+        surfaces = [(self.text(string, size, pos), pos) for string, size, pos in texts]
+        if refresh_texts:
+            rects = [surface.get_rect(topleft=pos) for surface, pos in surfaces]
+            if self.text_area is not None:
+                rects.append(self.text_area)
+
+            if len(rects) > 0:
+                area = rects[0].unionall(rects[1:])
+                self.win.fill((0, 0, 0), area)
+                self.shown[self.blocs_in(area)] = self.UNKNOWN
+                dirty.append(area)
+
+            self.text_area = None
+            if len(surfaces) > 0:
+                self.text_area = rects[0].unionall(rects[1:len(surfaces)])
+                self.under_texts = self.blocs_in(self.text_area)
+
+        # Repaint changed blocs only
+        for k, view in views:
+            map_pos_x_px, map_pos_y_px = self.map_pos(k)
+            for y, x in np.argwhere(view != self.shown[k]):
+                dirty.append(self.draw_bloc(self.win, map_pos_x_px, map_pos_y_px, y, x, view[y, x]))
+            self.shown[k] = view
+
+        if refresh_texts:
+            for surface, pos in surfaces:
+                self.win.blit(surface, pos)
+            self.shown_texts = texts
+
+        pygame.display.update(dirty)
@@ -0,0 +1,144 @@
+import os
+import gzip
+import json
+import pickle
+import argparse
+import multiprocessing
+
+import neat
+import numpy as np
+
+from evaluation import eval_genome
+import seeding
+
+
+# Scores saved genomes without rendering: every genome plays the same seeded games,
+# spread over a pool of processes, and the distribution of the results is reported
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(LOCAL_DIR, 'config-feedforward.txt')
+
+DEATHS = ['wall', 'self', 'hunger']
+
+
+def load_config(config_path=CONFIG_PATH):
+    return neat.config.Config(
+        neat.DefaultGenome,
+        neat.DefaultReproduction,
+        neat.DefaultSpeciesSet,
+        neat.DefaultStagnation,
+        config_path
+    )
+
+
+# Genome saved in path: a pickled genome (winner.pkl) or a checkpoint (gzip), whose best evaluated genome is taken
+def load_genome(path):
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+
+    if not compressed:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    with gzip.open(path) as f:
+        state = pickle.load(f)
+
+    # Offspring of the last generation have no fitness yet, the elites kept theirs
+    evaluated = [genome for genome in state['population'].values() if genome.fitness is not None]
+    if not evaluated:
+        raise ValueError('No evaluated genome in checkpoint {}'.format(path))
+
+    return max(evaluated, key=lambda genome: genome.fitness)
+
+
+# Plays one game per seed (one job of the pool), returns the fitness and stats of each game
+def play_episodes(genome, config, seeds, map_w, map_h, hunger_threshold):
+    return [eval_genome(genome, config, seed, map_w, map_h, hunger_threshold) for seed in seeds]
+
+
+# Plays episodes games with genome, seeded from seed, and returns the fitness and stats of each game (in seed order)
+# Games are sent to the pool in a few chunks per worker to limit inter-process overhead
+def score_genome(pool, workers, genome, config, episodes, seed=0, map_w=12, map_h=12, hunger_threshold=50):
+    seeds = [seeding.episode_seed(seed, episode) for episode in range(episodes)]
+    chunksize = max(1, -(-episodes // (4 * workers)))
+    chunks = [seeds[i:i + chunksize] for i in range(0, episodes, chunksize)]
+
+    results = pool.starmap(play_episodes, [(genome, config, chunk, map_w, map_h, hunger_threshold) for chunk in chunks])
+
+    return [result for chunk in results for result in chunk]
+
+
+# Distribution of the results of the games of a genome
+def summarize(results):
+    fitness = np.array([fitness for fitness, _ in results])
+    sizes = np.array([stats['size'] for _, stats in results])
+    steps = np.array([stats['env_steps'] for _, stats in results])
+    fruit_steps = np.array([s for _, stats in results for s in stats['fruit_steps']])
+    deaths = [stats['death'] for _, stats in results]
+
+    def percentiles(values):
+        if len(values) == 0:
+            return {'mean': None, 'p50': None, 'p95': None}
+        return {'mean': float(np.mean(values)), 'p50': float(np.percentile(values, 50)), 'p95': float(np.percentile(values, 95))}
+
+    return {
+        'episodes': len(results),
+        'fitness': percentiles(fitness),
+        'length': percentiles(sizes),
+        'max_length': int(np.max(sizes)),
+        'steps': percentiles(steps),
+        'steps_to_fruit': percentiles(fruit_steps),
+        'deaths': {death: deaths.count(death) / len(deaths) for death in DEATHS},
+    }
+
+
+def print_summary(name, summary):
+    def row(label, values, fmt='{:.1f}'):
+        if values['mean'] is None:
+            return '  {:<15} -'.format(label)
+        return '  {:<15} mean {}  p50 {}  p95 {}'.format(label, *(fmt.format(values[k]) for k in ['mean', 'p50', 'p95']))
+
+    print('{} ({} episodes)'.format(name, summary['episodes']))
+    print(row('fitness', summary['fitness'], '{:.2f}'))
+    print(row('length', summary['length']) + '  max {}'.format(summary['max_length']))
+    print(row('steps', summary['steps']))
+    print(row('steps to fruit', summary['steps_to_fruit']))
+    print('  {:<15} {}'.format('deaths', '  '.join('{} {:.0%}'.format(death, share) for death, share in summary['deaths'].items())))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score saved genomes (pickled genomes or checkpoints) on seeded games')
+    parser.add_argument('genomes', nargs='*', default=[os.path.join(LOCAL_DIR, 'winner.pkl')], help='genome or checkpoint files (winner.pkl by default)')
+    parser.add_argument('--episodes', type=int, default=1000, help='games played by each genome')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of processes playing games in parallel')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the games (the same games for every genome)')
+    parser.add_argument('--map-size', type=int, default=12, help='width and height of the map')
+    parser.add_argument('--hunger', type=int, default=50, help='steps without eating before a snake starves')
+    parser.add_argument('--output', help='JSON file the summaries are written to')
+    parser.add_argument('--render', action='store_true', help='watch each genome play in a window instead of scoring it')
+    args = parser.parse_args()
+
+    if args.episodes < 1:
+        parser.error('--episodes must be at least 1')
+
+    config = load_config()
+
+    # Visual replay of main.py (opens a window)
+    if args.render:
+        from main import watch_genome
+
+        for path in args.genomes:
+            watch_genome(config, load_genome(path))
+
+    else:
+        summaries = {}
+        with multiprocessing.Pool(args.workers) as pool:
+            for path in args.genomes:
+                results = score_genome(pool, args.workers, load_genome(path), config, args.episodes, args.seed, args.map_size, args.map_size, args.hunger)
+                summaries[path] = summarize(results)
+                print_summary(path, summaries[path])
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(summaries, f, indent=2)
+            print('Results written to {}'.format(args.output))
@@ -0,0 +1,29 @@
+import numpy as np
+
+
+# Every environment (map + snake) draws from its own random generator, derived from
+# (run seed, generation, genome key, episode): results do not depend on the evaluation order,
+# the process the evaluation runs in or the engine (objects, batch, compiled kernel)
+
+
+# Seed of a whole run, picked at random when none is given (print it to reproduce the run)
+def run_seed(seed=None):
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2 ** 63)
+
+    return seed
+
+
+# Entropy of an environment's generator, small enough to be sent to worker processes
+def env_seed(seed, generation, genome_key, episode=0):
+    return [seed, generation, genome_key, episode]
+
+
+# Random generator of an environment
+def env_rng(seed, generation, genome_key, episode=0):
+    return np.random.default_rng(env_seed(seed, generation, genome_key, episode))
+
+
+# Entropy of the episode-th game of an evaluation outside training (score.py), the same games for every genome
+def episode_seed(seed, episode):
+    return [seed, episode]
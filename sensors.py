@@ -0,0 +1,78 @@
+import numpy as np
+
+from map import Map
+
+# Bloc states that block a snake (those of Map)
+WALL, SNAKE = Map.WALL, Map.SNAKE
+
+
+# Number of inputs of the neural network for a neighbourhood of size n x n
+def nb_features(n=5):
+    if n % 2 == 0:
+        n += 1
+
+    return n * n + 10
+
+
+# Builds the inputs of the neural networks of many snakes at once, as a (len(envs), n * n + 10) array
+# grid holds one map per environment, every other argument holds one value per observed snake
+# Features are the same as Snake.observe: neighbourhood, distances to walls and fruit, velocities of head and tail
+def observe(grid, envs, head_y, head_x, fruit_y, fruit_x, x_vel, y_vel, tail_vel_y, tail_vel_x, n=5):
+    if n % 2 == 0:
+        n += 1
+    r = (n - 1) // 2
+
+    map_h, map_w = grid.shape[1], grid.shape[2]
+    envs = np.asarray(envs)
+    head_y = np.asarray(head_y)
+    head_x = np.asarray(head_x)
+
+    # n x n window around each head, gathered in one go (blocs outside of the map behave as walls)
+    offsets = np.arange(-r, r + 1)
+    ys = head_y[:, None] + offsets
+    xs = head_x[:, None] + offsets
+
+    inside = ((ys >= 0) & (ys < map_h))[:, :, None] & ((xs >= 0) & (xs < map_w))[:, None, :]
+    window = grid[envs[:, None, None], np.clip(ys, 0, map_h - 1)[:, :, None], np.clip(xs, 0, map_w - 1)[:, None, :]]
+
+    is_empty = inside & (window != WALL) & (window != SNAKE)
+    is_empty[:, r, r] = True                # The head does not block itself
+
+    obs = np.empty((len(envs), n * n + 10))
+    obs[:, :n * n] = is_empty.reshape(len(envs), n * n)
+
+    f = obs[:, n * n:]
+    f[:, 0] = head_y                        # Distance to the top wall
+    f[:, 1] = map_h - head_y                # Distance to the bot wall
+    f[:, 2] = head_x                        # Distance to the left wall
+    f[:, 3] = map_w - head_x                # Distance to the right wall
+    f[:, 4] = head_y - fruit_y              # Distance to fruit on y axis
+    f[:, 5] = head_x - fruit_x              # Distance to fruit on x axis
+    f[:, 6] = x_vel
+    f[:, 7] = y_vel
+    f[:, 8] = tail_vel_y                    # Tail velocity on y axis
+    f[:, 9] = tail_vel_x                    # Tail velocity on x axis
+
+    return obs
+
+
+# Same as observe, for a list of Snake objects (their maps are stacked into one grid)
+def observe_snakes(snakes, n=5):
+    grid = np.stack([snake.map.map for snake in snakes])
+
+    heads = np.array([snake.body[snake.head] for snake in snakes]).reshape(-1, 2)
+    tails_vel = np.array([snake.tail_vel() for snake in snakes]).reshape(-1, 2)
+
+    return observe(
+        grid,
+        np.arange(len(snakes)),
+        heads[:, 0],
+        heads[:, 1],
+        [snake.map.fruit_pos_y for snake in snakes],
+        [snake.map.fruit_pos_x for snake in snakes],
+        [snake.x_vel for snake in snakes],
+        [snake.y_vel for snake in snakes],
+        tails_vel[:, 0],
+        tails_vel[:, 1],
+        n=n,
+    )
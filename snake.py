@@ -1,7 +1,12 @@
-import pygame
 import numpy as np
 
+import sensors
+
+# Slots keep the per-snake overhead small (thousands of environments are simulated at once)
 class Snake:
+    __slots__ = ('map', 'size', 'COL_HEAD', 'COL_BODY', 'HUNGER_TH', 'body', 'head', 'x_vel', 'y_vel', 'changed_dir',
+        'alive', 'steps', 'steps_without_eating', 'hungry', 'death')
+
     def __init__(self, map, size, col_head, col_body, hunger_threshold = 200):
         # Put snake on the right map and give it the specified size
         self.map = map
@@ -9,10 +14,14 @@ class Snake:
         self.COL_HEAD, self.COL_BODY = col_head, col_body
         self.HUNGER_TH = hunger_threshold
 
-        # Create snake and put its head on a safe position (no collision at spawn)
-        self.snake = np.zeros(shape=(self.size, 2), dtype=int)
-        self.snake[0][0] = np.random.randint(self.size, self.map.MAP_H - self.size)     # y postion of the head
-        self.snake[0][1] = np.random.randint(self.size, self.map.MAP_W - self.size)     # x postion of the head
+        # Body stored as a ring buffer as big as the map (so growing never reallocates), as int16 (y, x) pairs
+        # Body part k (0 being the head) is at index (self.head - k) % len(self.body)
+        self.body = np.zeros(shape=(self.map.MAP_W * self.map.MAP_H, 2), dtype=np.int16)
+        self.head = self.size - 1
+
+        # Put its head on a safe position (no collision at spawn), drawn from the map's random generator
+        self.body[self.head][0] = self.map.rng.integers(self.size, self.map.MAP_H - self.size)     # y postion of the head
+        self.body[self.head][1] = self.map.rng.integers(self.size, self.map.MAP_W - self.size)     # x postion of the head
 
         # Choose starting direction (-> towards farthest wall)
         self.x_vel = 0
@@ -32,20 +41,27 @@ class Snake:
             self.change_dir('right')
 
         # Put body parts following direction
-        for i in range(1, len(self.snake)):
-            self.snake[i][0] = self.snake[i-1][0] - self.y_vel
-            self.snake[i][1] = self.snake[i-1][1] - self.x_vel
+        for i in range(1, self.size):
+            self.body[self.head - i][0] = self.body[self.head - i + 1][0] - self.y_vel
+            self.body[self.head - i][1] = self.body[self.head - i + 1][1] - self.x_vel
 
-        for i in range(len(self.snake)):
-            self.map.map[self.snake[i][0]][self.snake[i][1]] = self.map.SNAKE
+        for i in range(self.size):
+            self.map.map[self.body[i][0]][self.body[i][1]] = self.map.SNAKE
 
         # Setup snake properties
         self.alive = True
         self.steps = 0
         self.steps_without_eating = 0
         self.hungry = False
+        self.death = None                       # What killed the snake: 'wall' or 'self' (set by the game for hunger)
 
     
+    # Body parts positions (y, x), from head to tail
+    @property
+    def snake(self):
+        return self.body[(self.head - np.arange(self.size)) % len(self.body)]
+
+
     # Updates the snake at each call
     def update(self):
         if self.alive:
@@ -61,52 +77,39 @@ class Snake:
     
     # Moves the snake following the velocity, if move hits wall, snake dies
     def move(self):
-        next_pos_x = (self.snake[0][1] + self.x_vel) % self.map.MAP_W
-        next_pos_y = (self.snake[0][0] + self.y_vel) % self.map.MAP_H
+        next_pos_x = (self.body[self.head][1] + self.x_vel) % self.map.MAP_W
+        next_pos_y = (self.body[self.head][0] + self.y_vel) % self.map.MAP_H
 
         # Die if hits wall
         if self.map.map[next_pos_y][next_pos_x] == self.map.WALL:
             self.alive = False
+            self.death = 'wall'
             return
 
-        # Die if hits self
-        for i in range(1, len(self.snake)):
-            if next_pos_x == self.snake[i][1] and next_pos_y == self.snake[i][0]:
-                self.alive = False
-                return
+        # Die if hits self (the map marks every body part, the tail only frees its bloc once the head has moved)
+        if self.map.map[next_pos_y][next_pos_x] == self.map.SNAKE:
+            self.alive = False
+            self.death = 'self'
+            return
 
-        # Grow if eats fruit
+        # Grow if eats fruit (the tail stays where it is)
         if self.map.map[next_pos_y][next_pos_x] == self.map.FRUIT:
             self.size += 1
             self.steps_without_eating = -1
 
             self.map.fruit_on_map = False
 
-            self.snake = np.append(self.snake, [[self.snake[-1][0] + self.tail_vel()[0], self.snake[-1][1] + self.tail_vel()[1]]], axis=0)
-
-        
-        # Move body if everything OK
-        prev_x = self.snake[0][1]
-        prev_y = self.snake[0][0]
-
-        self.snake[0][1] = next_pos_x
-        self.snake[0][0] = next_pos_y
+        # Otherwise the tail frees its bloc
+        else:
+            tail = self.body[(self.head - self.size + 1) % len(self.body)]
+            self.map.map[tail[0]][tail[1]] = self.map.EMPTY
 
-        self.map.map[prev_y][prev_x] = self.map.EMPTY
-        self.map.map[self.snake[0][0]][self.snake[0][1]] = self.map.SNAKE
-        
-        for i in range(1, len(self.snake)):
-            tmp_x = self.snake[i][1]
-            tmp_y = self.snake[i][0]
-
-            self.snake[i][1] = prev_x
-            self.snake[i][0] = prev_y
-
-            prev_x = tmp_x
-            prev_y = tmp_y
+        # Move head if everything OK (only the new head and the old tail blocs change)
+        self.head = (self.head + 1) % len(self.body)
+        self.body[self.head][0] = next_pos_y
+        self.body[self.head][1] = next_pos_x
 
-            self.map.map[prev_y][prev_x] = self.map.EMPTY
-            self.map.map[self.snake[i][0]][self.snake[i][1]] = self.map.SNAKE
+        self.map.map[next_pos_y][next_pos_x] = self.map.SNAKE
 
         # Increase steps taken
         self.steps += 1
@@ -115,6 +118,8 @@ class Snake:
 
     # Draw snake on window (on the right map)
     def draw(self, win, bloc_size_x, bloc_size_y, debug=False):
+        import pygame
+
         map_pos_x_px = bloc_size_x * self.map.MAP_W * self.map.POS_X
         map_pos_y_px = bloc_size_y * self.map.MAP_H * self.map.POS_Y
 
@@ -123,9 +128,10 @@ class Snake:
         bloc_w = int(p * bloc_size_x)
         bloc_h = int(p * bloc_size_y)
 
-        for i in range(len(self.snake)):
-            pos_x = int(map_pos_x_px + bloc_size_x * self.snake[i][1] + (1 - p) * bloc_size_x / 2)
-            pos_y = int(map_pos_y_px + bloc_size_y * self.snake[i][0] + (1 - p) * bloc_size_y / 2)
+        snake = self.snake
+        for i in range(len(snake)):
+            pos_x = int(map_pos_x_px + bloc_size_x * snake[i][1] + (1 - p) * bloc_size_x / 2)
+            pos_y = int(map_pos_y_px + bloc_size_y * snake[i][0] + (1 - p) * bloc_size_y / 2)
             
             col = self.COL_BODY
             if i == 0:
@@ -148,8 +154,8 @@ class Snake:
 
             for i in range(int(-(n-1) / 2), int(((n-1) / 2) + 1)):
                 for j in range(int(-(n-1) / 2), int(((n-1) / 2) + 1)):
-                    pos_x = int(map_pos_x_px + bloc_size_x * (self.snake[0][1] + j) + (1 - p) * bloc_size_x / 2)
-                    pos_y = int(map_pos_y_px + bloc_size_y * (self.snake[0][0] + i) + (1 - p) * bloc_size_y / 2)
+                    pos_x = int(map_pos_x_px + bloc_size_x * (snake[0][1] + j) + (1 - p) * bloc_size_x / 2)
+                    pos_y = int(map_pos_y_px + bloc_size_y * (snake[0][0] + i) + (1 - p) * bloc_size_y / 2)
 
                     if i == 0 and j == 0:
                         continue
@@ -185,13 +191,34 @@ class Snake:
             self.changed_dir = True
 
 
+    # Builds the inputs of the neural network: neighbourhood, distances, own and tail velocities (see sensors.observe)
+    def observe(self, n=5):
+        return sensors.observe_snakes([self], n=n)[0]
+
+
+    # Changes direction following the strongest output of the neural network (if above threshold)
+    def act(self, output, th=0.5):
+        if np.max(output) == output[0]:
+            if output[0] > th:
+                self.change_dir('up')
+        elif np.max(output) == output[1]:
+            if output[1] > th:
+                self.change_dir('down')
+        elif np.max(output) == output[2]:
+            if output[2] > th:
+                self.change_dir('left')
+        elif np.max(output) == output[3]:
+            if output[3] > th:
+                self.change_dir('right')
+
+
     # Returns array with distances to edge walls
     def distances_to_walls(self):
         dists = [
-            self.snake[0][0],                       # Distance to the top wall
-            self.map.MAP_H - self.snake[0][0],      # Distance to the bot wall
-            self.snake[0][1],                       # Distance to the left wall
-            self.map.MAP_W - self.snake[0][1],      # Distance to the right wall
+            self.body[self.head][0],                        # Distance to the top wall
+            self.map.MAP_H - self.body[self.head][0],       # Distance to the bot wall
+            self.body[self.head][1],                        # Distance to the left wall
+            self.map.MAP_W - self.body[self.head][1],       # Distance to the right wall
         ]
 
         return dists
@@ -199,8 +226,8 @@ class Snake:
     # Returns array with distance to fruit
     def distances_to_fruit(self):
         dists = [
-            self.snake[0][0] - self.map.fruit_pos_y,    # Distance to fruit on y axis
-            self.snake[0][1] - self.map.fruit_pos_x,    # Distance to fruit on x axis
+            self.body[self.head][0] - self.map.fruit_pos_y,     # Distance to fruit on y axis
+            self.body[self.head][1] - self.map.fruit_pos_x,     # Distance to fruit on x axis
         ]
 
         return dists
@@ -214,8 +241,8 @@ class Snake:
         is_empty = np.full((n, n), True)
         is_fruit = np.full((n, n), False)
 
-        pos_x = self.snake[0][1]
-        pos_y = self.snake[0][0]
+        pos_x = self.body[self.head][1]
+        pos_y = self.body[self.head][0]
 
         for i in range(int(-(n-1) / 2), int(((n-1) / 2) + 1)):
             for j in range(int(-(n-1) / 2), int(((n-1) / 2) + 1)):
@@ -230,19 +257,21 @@ class Snake:
                 elif self.map.map[pos_y + i][pos_x + j] == self.map.FRUIT:
                     is_fruit[int((n - 1) / 2) + i][int((n - 1) / 2) + j] = True
 
-                else:
-                    for k in range(1, len(self.snake)):
-                        if pos_y + i == self.snake[k][0] and pos_x + j == self.snake[k][1]:
-                            is_empty[int((n - 1) / 2) + i][int((n - 1) / 2) + j] = False
+                # Body parts are marked on the map (the head's own bloc doesn't count)
+                elif self.map.map[pos_y + i][pos_x + j] == self.map.SNAKE and (i != 0 or j != 0):
+                    is_empty[int((n - 1) / 2) + i][int((n - 1) / 2) + j] = False
 
         return is_empty, is_fruit
 
 
     # x and y velocities of the tail    
     def tail_vel(self):
+        tail = self.body[(self.head - self.size + 1) % len(self.body)]
+        before_tail = self.body[(self.head - self.size + 2) % len(self.body)]
+
         vel = [
-            self.snake[-2][0] - self.snake[-1][0],      # Tail velocity on y axis
-            self.snake[-2][1] - self.snake[-1][1],      # Tail velocity on x axis
+            before_tail[0] - tail[0],       # Tail velocity on y axis
+            before_tail[1] - tail[1],       # Tail velocity on x axis
         ]
 
         return vel
\ No newline at end of file
@@ -0,0 +1,271 @@
+import os
+import atexit
+import time
+import argparse
+
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+
+# Default name of the shared memory block holding the latest frame
+FRAMES_NAME = 'snake_neat_frames'
+
+
+# Latest frame of the training (every map's grid and snake head) in a shared memory block
+# One process writes, any number of viewers read: a sequence number works as a lock-free seqlock
+# (odd while a frame is being written, readers retry if it changed during their copy)
+class FrameBuffer:
+    # Header fields (int64)
+    SEQ = 0
+    OPEN = 1
+    NB_MAPS_W = 2
+    NB_MAPS_H = 3
+    MAP_W = 4
+    MAP_H = 5
+    GENERATION = 6
+    MAX_SIZE = 7
+    GENERAL_MAX_SIZE = 8
+    PID = 9             # Process writing the frames
+    HEADER_SIZE = 10
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+
+        self.header = np.ndarray(self.HEADER_SIZE, dtype=np.int64, buffer=shm.buf)
+        self.NB_MAPS_W, self.NB_MAPS_H = int(self.header[self.NB_MAPS_W]), int(self.header[self.NB_MAPS_H])
+        self.MAP_W, self.MAP_H = int(self.header[self.MAP_W]), int(self.header[self.MAP_H])
+
+        nb_maps = self.NB_MAPS_W * self.NB_MAPS_H
+        offset = self.header.nbytes
+        self.heads = np.ndarray((nb_maps, 2), dtype=np.int32, buffer=shm.buf, offset=offset)
+        offset += self.heads.nbytes
+        self.grids = np.ndarray((nb_maps, self.MAP_H, self.MAP_W), dtype=np.int8, buffer=shm.buf, offset=offset)
+        offset += self.grids.nbytes
+        self.visible = np.ndarray(nb_maps, dtype=bool, buffer=shm.buf, offset=offset)
+
+
+    # Size in bytes of the block for the given layout
+    @classmethod
+    def nbytes(cls, nb_maps_w, nb_maps_h, map_w, map_h):
+        nb_maps = nb_maps_w * nb_maps_h
+        return 8 * cls.HEADER_SIZE + nb_maps * (2 * 4 + map_h * map_w + 1)
+
+
+    # Creates the block, replacing a stale one left by a crashed run
+    # Raises FileExistsError if a running training already publishes under this name
+    @classmethod
+    def create(cls, nb_maps_w, nb_maps_h, map_w, map_h, name=FRAMES_NAME):
+        size = cls.nbytes(nb_maps_w, nb_maps_h, map_w, map_h)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            existing = shared_memory.SharedMemory(name=name)
+            pid = None
+            if existing.size >= 8 * cls.HEADER_SIZE:
+                header = np.ndarray(cls.HEADER_SIZE, dtype=np.int64, buffer=existing.buf)
+                if header[cls.OPEN] and process_alive(int(header[cls.PID])):
+                    pid = int(header[cls.PID])
+                del header
+
+            if pid is not None:
+                resource_tracker.unregister(existing._name, 'shared_memory')
+                existing.close()
+                raise FileExistsError('Training process {} already publishes frames as {}, publish under another name'.format(pid, name))
+
+            existing.close()
+            existing.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        header = np.ndarray(cls.HEADER_SIZE, dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[cls.NB_MAPS_W], header[cls.NB_MAPS_H] = nb_maps_w, nb_maps_h
+        header[cls.MAP_W], header[cls.MAP_H] = map_w, map_h
+        header[cls.PID] = os.getpid()
+        header[cls.OPEN] = 1
+        del header
+
+        return cls(shm, owner=True)
+
+
+    # Attaches to the block of a running training, returns None if there is none
+    @classmethod
+    def attach(cls, name=FRAMES_NAME):
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            return None
+
+        # The block belongs to the training process: do not let this process' resource tracker destroy it on exit
+        resource_tracker.unregister(shm._name, 'shared_memory')
+
+        return cls(shm, owner=False)
+
+
+    # Writes a frame: frames holds (map index, grid, head y, head x) for each map to show
+    def write(self, frames, generation, max_size, general_max_size):
+        self.header[self.SEQ] += 1
+
+        self.visible[:] = False
+        for k, grid, head_y, head_x in frames:
+            self.grids[k] = grid
+            self.heads[k] = head_y, head_x
+            self.visible[k] = True
+
+        self.header[self.GENERATION] = -1 if generation is None else generation
+        self.header[self.MAX_SIZE] = -1 if max_size is None else max_size
+        self.header[self.GENERAL_MAX_SIZE] = -1 if general_max_size is None else general_max_size
+
+        self.header[self.SEQ] += 1
+
+
+    # Copies the latest complete frame, returns (seq, frames, generation, max_size, general_max_size)
+    # or None if the writer kept changing it during every try
+    def read(self, tries=10):
+        for _ in range(tries):
+            seq = int(self.header[self.SEQ])
+            if seq % 2 == 1:
+                time.sleep(0)
+                continue
+
+            grids, heads, visible = self.grids.copy(), self.heads.copy(), self.visible.copy()
+            infos = [int(self.header[f]) for f in (self.GENERATION, self.MAX_SIZE, self.GENERAL_MAX_SIZE)]
+
+            if int(self.header[self.SEQ]) == seq:
+                frames = [(k, grids[k], heads[k, 0], heads[k, 1]) for k in np.flatnonzero(visible)]
+                return (seq, frames) + tuple(None if v < 0 else v for v in infos)
+
+        return None
+
+
+    def is_open(self):
+        return bool(self.header[self.OPEN])
+
+
+    # Detaches from the block (and destroys it if this process created it)
+    def close(self):
+        if self.shm is None:
+            return
+
+        if self.owner:
+            self.header[self.OPEN] = 0
+
+        del self.header, self.heads, self.grids, self.visible
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+
+# Whether process pid is running (a block whose writer is gone can be replaced)
+def process_alive(pid):
+    if pid <= 0:
+        return False
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+# Training side: publishes the state of the simulation at most fps times per second
+# Between two publications, due() only costs a clock read, so the simulation keeps running at full speed
+class Publisher:
+    def __init__(self, nb_maps_w, nb_maps_h, map_w, map_h, fps=30, name=FRAMES_NAME):
+        self.buffer = FrameBuffer.create(nb_maps_w, nb_maps_h, map_w, map_h, name=name)
+        self.period = 1 / fps
+        self.last_publish = 0
+
+        atexit.register(self.close)
+
+
+    def due(self):
+        return time.perf_counter() - self.last_publish >= self.period
+
+
+    def publish(self, frames, generation=None, max_size=None, general_max_size=None):
+        self.buffer.write(frames, generation, max_size, general_max_size)
+        self.last_publish = time.perf_counter()
+
+
+    def close(self):
+        self.buffer.close()
+
+
+# Viewer side: shows the frames published by a training at a fixed rate, in its own window and process
+# It can be started and closed at any time without affecting the training
+def view(win_w=600, win_h=600, fps=30, name=FRAMES_NAME):
+    import pygame
+    from render import Renderer
+
+    buffer = FrameBuffer.attach(name)
+    while buffer is None:
+        print('Waiting for a training to publish frames ({})...'.format(name))
+        time.sleep(1)
+        buffer = FrameBuffer.attach(name)
+
+    # Setup for rendering (same layout as Game)
+    nb_maps_w, nb_maps_h = buffer.NB_MAPS_W, buffer.NB_MAPS_H
+    nb_blocs_w, nb_blocs_h = buffer.MAP_W, buffer.MAP_H
+
+    while win_w % (nb_blocs_w * nb_maps_w) != 0:
+        win_w -=1
+    while win_h % (nb_blocs_h * nb_maps_h) != 0:
+        win_h -=1
+
+    pygame.init()
+    win = pygame.display.set_mode((win_w, win_h))
+    pygame.display.set_caption('Snake NEAT viewer')
+    renderer = Renderer(
+        win, nb_maps_w, nb_maps_h, nb_blocs_w, nb_blocs_h, (win_w / nb_maps_w) / nb_blocs_w, (win_h / nb_maps_h) / nb_blocs_h,
+        [255, 255, 255], [255, 0, 255], [255, 0, 0], [0, 255, 255],
+    )
+
+    clock = pygame.time.Clock()
+    last_seq = -1
+    running = True
+    while running:
+        clock.tick(fps)
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYUP and event.key == pygame.K_ESCAPE):
+                running = False
+
+        if not buffer.is_open():
+            print('Training ended')
+            running = False
+
+        snapshot = buffer.read()
+        if snapshot is None or snapshot[0] == last_seq:
+            continue
+
+        last_seq, frames, generation, max_size, general_max_size = snapshot
+
+        # Info texts (same as Game.draw)
+        texts = []
+        if generation is not None:
+            texts.append(('Gen: ' + str(generation), 15, (12, 10)))
+
+        if max_size is not None:
+            texts.append(('Max size: ' + str(max_size), 12, (132, 10)))
+
+        if general_max_size is not None:
+            texts.append(('Max size (all): ' + str(general_max_size), 12, (132, 25)))
+
+        renderer.draw(frames, texts)
+
+    buffer.close()
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Watch a training started with main.py --publish')
+    parser.add_argument('--fps', type=int, default=30, help='frames shown per second')
+    parser.add_argument('--name', default=FRAMES_NAME, help='name of the shared memory block')
+    args = parser.parse_args()
+
+    view(fps=args.fps, name=args.name)